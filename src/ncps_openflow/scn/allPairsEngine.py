@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+scn.allPairsEngine
+~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+
+from scn import pathSearch
+from scn.pathSearch import shortestPath, allPairsNextHops, tablePath
+
+import datetime
+import time
+
+log = core.getLogger()
+
+ALL_PAIRS_MAX_SWITCHS  = 300 # larger graphs are searched by Dijkstra
+ALL_PAIRS_MIN_INTERVAL = 5   # min seconds between two builds of the table
+
+
+class AllPairsEngine:
+    """next-hop matrix of all switch pairs (scn.pathSearch.allPairsNextHops)
+        of the graph of UsedBwGraph. a search is a table walk.
+        the table is built again when the topologyEpoch or bwEpoch of
+        UsedBwGraph changes, at most once per minInterval: meanwhile the
+        table is out of date and searches are done by Dijkstra.
+        other graphs, graphs of more than maxSwitchs switchs, or without
+        numpy, are searched by Dijkstra.
+    """
+
+    def __init__(self, usedBwGraph, maxSwitchs=ALL_PAIRS_MAX_SWITCHS,
+                 minInterval=ALL_PAIRS_MIN_INTERVAL):
+        self.usedBwGraph = usedBwGraph
+        self.maxSwitchs = maxSwitchs
+        self.minInterval = minInterval
+        # { forceRoute: (epoch, build time, table), ...}
+        self._tables = {}
+        self.builds = 0
+
+        if pathSearch.numpy is None:
+            log.warn("numpy is not available, all pairs engine disabled")
+
+#_____________________________________________________________________________#
+
+    def isUsable(self, graph):
+        return pathSearch.numpy is not None and len(graph) <= self.maxSwitchs
+
+
+    def shortestPath(self, graph, src, dst, forceRoute=False):
+        if not self.isUsable(graph) or graph is not self.usedBwGraph.view(forceRoute):
+            return shortestPath(graph, src, dst)
+
+        table = self._getTable(graph, forceRoute)
+        if table is None:
+            return shortestPath(graph, src, dst)
+
+        path = tablePath(table, graph, src, dst)
+        if not path:
+            return shortestPath(graph, src, dst)
+        return path
+
+
+    def _getTable(self, graph, forceRoute):
+        """table of the current epoch, None while a build is throttled.
+        """
+        epoch = (self.usedBwGraph.topologyEpoch, self.usedBwGraph.bwEpoch)
+        now = time.time()
+        built = self._tables.get(forceRoute)
+        if built is not None:
+            builtEpoch, builtTime, table = built
+            if builtEpoch == epoch:
+                return table
+            if now - builtTime < self.minInterval:
+                return None
+
+        t1 = datetime.datetime.now()
+        table = allPairsNextHops(graph)
+        self._tables[forceRoute] = (epoch, now, table)
+        self.builds += 1
+        log.debug("all pairs table of %d switchs built in %s"
+                  % (len(graph), datetime.datetime.now() - t1))
+        return table
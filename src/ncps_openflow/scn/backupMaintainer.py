@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+scn.backupMaintainer
+~~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+from pox.lib.recoco import Timer
+
+from scn.pathSearch import shortestPath
+
+log = core.getLogger()
+
+BACKUP_PERIOD = 5       # seconds between two refreshes of the backups
+BACKUP_MAX_ROUTES = 20  # backups computed per refresh, the rest waits
+OVERLAP_COST  = 10**12  # cost of an edge shared with the primary via
+
+
+class BackupMaintainer:
+    """Precomputed backup vias of reserved routes (Routing.routes with a
+        bandwidth condition), for fast failover.
+        a backup via is link-disjoint with the route when possible, else
+        it shares as few switch pairs as possible. its other links have
+        the reserved bandwidth of the route as residual.
+
+        backups are computed by a timer, at most maxRoutes per refresh
+        (routes without backup first), and again when the route or the
+        topologyEpoch of UsedBwGraph changes: bandwidth changes alone do
+        not refresh them. when a link of a route is removed, Routing
+        uses the backup instead of a path search.
+    """
+
+    def __init__(self, routing, period=BACKUP_PERIOD, maxRoutes=BACKUP_MAX_ROUTES):
+        self.routing = routing
+        self.maxRoutes = maxRoutes
+
+        # { cookie: (topologyEpoch, primary links, via or None), ...}
+        self.backups = {}
+        self.failovers = 0
+
+        self._timer = Timer(period, self.refresh, recurring=True)
+
+#_____________________________________________________________________________#
+
+    def isProtected(self, route):
+        if route.getReservedBandwidth() <= 0 or not route.links or not route.entries:
+            return False
+        if self.routing.meshMaintainer.isMeshRoute(route):
+            return False
+        return any(link.dpid1 != link.dpid2 for link in route.links)
+
+
+    def getBackup(self, route, removedLink):
+        """get the backup via of route, None if it has none or if it
+            also goes through removedLink.
+        """
+        backup = self.backups.get(route.cookie)
+        if backup is None:
+            return None
+        epoch, links, via = backup
+        if via is None or links != tuple(route.links):
+            return None
+
+        for link in via:
+            if link is removedLink:
+                return None
+            if link.dpid1 == link.dpid2:
+                continue
+            if core.openflow_discovery.getLink(link.ofp1, link.ofp2) is not link:
+                return None # removed too
+        return via
+
+#_____________________________________________________________________________#
+
+    def refresh(self):
+        """compute the backups that are missing or out of date.
+        """
+        epoch = self.routing.usedBwGraph.topologyEpoch
+        routes = self.routing.routes
+
+        for cookie in self.backups.keys():
+            if cookie not in routes:
+                del self.backups[cookie]
+
+        # [(has a backup, cookie, route, links), ...]
+        outdated = []
+        for cookie, route in routes.items():
+            if not self.isProtected(route):
+                self.backups.pop(cookie, None)
+                continue
+
+            links = tuple(route.links)
+            backup = self.backups.get(cookie)
+            if backup is not None and backup[0] == epoch and backup[1] == links:
+                continue
+            outdated.append((backup is not None, cookie, route, links))
+
+        outdated.sort(key=lambda item: item[0])
+        for _, cookie, route, links in outdated[:self.maxRoutes]:
+            try:
+                via = self.computeBackup(route)
+            except Exception as inst:
+                log.exception(inst)
+                via = None
+            self.backups[cookie] = (epoch, links, via)
+
+        if outdated:
+            log.debug("%d backup vias computed, %d left"
+                      % (min(len(outdated), self.maxRoutes), max(len(outdated) - self.maxRoutes, 0)))
+
+
+    def computeBackup(self, route):
+        """search a backup via of route, None if there is none.
+        """
+        usedBwGraph = self.routing.usedBwGraph
+        bw = route.getReservedBandwidth()
+
+        # { (dpid1, dpid2): link, ...} both directions
+        primary = {}
+        for link in route.links:
+            if link.dpid1 == link.dpid2:
+                continue
+            primary[(link.dpid1, link.dpid2)] = link
+            primary.setdefault((link.dpid2, link.dpid1), None)
+
+        graph = {}
+        for dpid1, row in self.routing.getUsedBwGraph(self.routing.forceRoute).iteritems():
+            edges = graph[dpid1] = {}
+            for dpid2, cost in row.iteritems():
+                if (dpid1, dpid2) in primary:
+                    edges[dpid2] = cost + OVERLAP_COST
+                elif usedBwGraph.getFeasibleLink(dpid1, dpid2, bw) is not None:
+                    edges[dpid2] = cost
+
+        srcdpid = route.links.firstSwitch().dpid
+        dstdpid = route.links.lastSwitch().dpid
+        hops = shortestPath(graph, srcdpid, dstdpid)
+        if not hops:
+            return None
+
+        via = []
+        for dpid1, dpid2, _ in hops:
+            link = primary.get((dpid1, dpid2))
+            if link is None:
+                link = usedBwGraph.getFeasibleLink(dpid1, dpid2, bw) or usedBwGraph.getLink(dpid1, dpid2)
+            via.append(link)
+
+        if all((dpid1, dpid2) in primary for dpid1, dpid2, _ in hops):
+            return None # no other way
+        return via
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+scn.computeService
+~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+from pox.lib.recoco import Timer
+
+from itertools import count
+from multiprocessing import Pool
+import Queue
+import time
+import traceback
+
+log = core.getLogger()
+NAME = 'computeService'
+
+POLL_PERIOD = 0.05 # seconds
+
+
+def _call(func, args):
+    """run func in a worker process.
+        exceptions are returned, apply_async of python2 can not report them.
+    """
+    try:
+        return func(*args), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+class ComputeService:
+    """Run path searches in a pool of worker processes.
+        func and args must be picklable: use module level functions
+        (scn.pathSearch) and immutable snapshots like
+        Routing.getUsedBwGraph().
+
+          core.computeService.submit(key, func, args, callback)
+
+        results are put in a completion queue by the pool and callbacks
+        are called on the recoco loop by a timer. per key, only the
+        result of the last submitted job is applied: a result never
+        overrides the result of a later submit. a job with a deadline
+        whose result is not back in time is dropped and its fallback
+        is called instead.
+    """
+
+    def __init__(self, processes=None, period=POLL_PERIOD):
+        self._pool = Pool(processes)
+        # (key, seq, callback, result, error) put by the pool result thread
+        self._done = Queue.Queue()
+        self._seq = count(1)
+        # { key: seq of the last submitted job, ...}
+        self._pending = {}
+        # { key: (seq, deadline time, fallback), ...}
+        self._deadlines = {}
+        self.stale = 0
+
+        self._timer = Timer(period, self._poll, recurring=True)
+        core.addListenerByName("GoingDownEvent", self._handle_GoingDownEvent)
+
+#_____________________________________________________________________________#
+
+    def submit(self, key, func, args=(), callback=None, deadline=None, fallback=None):
+        """run func(*args) in a worker.
+            key -- ordering key (ex: a path), a pending job of the same key
+                   is superseded.
+            callback -- callable(result) called on the recoco loop,
+                        result is None if func raised.
+            deadline -- seconds to wait for the result. after it, the job
+                        is dropped and fallback() is called on the loop.
+        """
+        seq = next(self._seq)
+        self._pending[key] = seq
+        self._deadlines.pop(key, None)
+        if deadline is not None:
+            self._deadlines[key] = (seq, time.time() + deadline, fallback)
+
+        def done(res):
+            result, error = res
+            self._done.put((key, seq, callback, result, error))
+
+        self._pool.apply_async(_call, (func, args), callback=done)
+        return seq
+
+
+    def isPending(self, key):
+        return key in self._pending
+
+#_____________________________________________________________________________#
+
+    def _poll(self):
+        while True:
+            try:
+                key, seq, callback, result, error = self._done.get_nowait()
+            except Queue.Empty:
+                break
+
+            if self._pending.get(key) != seq:
+                self.stale += 1
+                log.debug("drop stale result of %s (seq = %s)" % (key, seq))
+                continue
+            del self._pending[key]
+            self._deadlines.pop(key, None)
+
+            if error is not None:
+                log.error("compute job %s failed:\n%s" % (key, error))
+
+            if callback is None:
+                continue
+            try:
+                callback(result)
+            except Exception as inst:
+                log.exception(inst)
+
+        self._expire()
+
+
+    def _expire(self):
+        now = time.time()
+        for key, (seq, limit, fallback) in self._deadlines.items():
+            if limit > now:
+                continue
+            del self._deadlines[key]
+            if self._pending.get(key) != seq:
+                continue
+            # a late result is dropped as stale
+            del self._pending[key]
+            log.warn("compute job %s missed its deadline" % (key,))
+
+            if fallback is None:
+                continue
+            try:
+                fallback()
+            except Exception as inst:
+                log.exception(inst)
+
+
+    def _handle_GoingDownEvent(self, event):
+        self._timer.cancel()
+        self._pool.terminate()
+
+
+def launch(processes=None):
+    if core.hasComponent(NAME):
+        return None
+
+    comp = ComputeService(int(processes) if processes else None)
+    core.register(NAME, comp)
+    return comp
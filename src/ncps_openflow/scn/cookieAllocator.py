@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+scn.cookieAllocator
+~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from collections import deque
+
+from pox.core import core
+
+log = core.getLogger()
+
+COOKIE_WIDTH   = 32
+MAX_WIDTH      = 64 # OpenFlow cookie is 64 bits
+JSON_SAFE_MAX  = 2**53 - 1 # javascript's JSON.parse truncates larger integers
+
+
+def cookieToJson(cookie):
+    """encode cookie for JSON consumers.
+        cookies larger than JSON_SAFE_MAX are encoded as string.
+    """
+    if cookie is None or cookie <= JSON_SAFE_MAX:
+        return cookie
+    return str(cookie)
+
+
+class CookieAllocator:
+    """Cookie allocator shared by Routing and middleware.
+        reserve/release are O(1) (amortized).
+        fresh cookies are used first, then released cookies in the order
+        they have been released, so a cookie is reused as late as possible.
+    """
+
+    def __init__(self, width=COOKIE_WIDTH):
+        width = int(width)
+        if width < 1 or MAX_WIDTH < width:
+            raise ValueError("invalid cookie width {%s}. 1 - %d" % (width, MAX_WIDTH))
+
+        self.width = width
+        self.maxCookie = 2**width - 1
+        if self.maxCookie > JSON_SAFE_MAX:
+            log.warn("cookies larger than %d are sent to JSON consumers as string" % JSON_SAFE_MAX)
+
+        self._next = 1 # cookies from _next to maxCookie have never been used
+        self._free = deque() # released cookies
+        self._reserved = set()
+
+
+    def __len__(self):
+        return len(self._reserved)
+
+
+    def __contains__(self, cookie):
+        return cookie in self._reserved
+
+
+    def reserve(self):
+        """reserve a cookie.
+            return None if all cookies are in use.
+        """
+        while self._next <= self.maxCookie:
+            cookie = self._next
+            self._next += 1
+            if cookie not in self._reserved:
+                self._reserved.add(cookie)
+                return cookie
+
+        while self._free:
+            cookie = self._free.popleft()
+            if cookie not in self._reserved:
+                self._reserved.add(cookie)
+                return cookie
+
+        log.error("no more cookie available (width = %d)" % self.width)
+        return None
+
+
+    def claim(self, cookie):
+        """reserve a given cookie (e.g. restored one).
+            return False if it is already reserved or out of range.
+        """
+        if cookie < 1 or self.maxCookie < cookie or cookie in self._reserved:
+            return False
+
+        if cookie < self._next:
+            try:
+                self._free.remove(cookie)
+            except ValueError:
+                pass
+
+        self._reserved.add(cookie)
+        return True
+
+
+    def release(self, cookie):
+        """release a reserved cookie.
+        """
+        if cookie not in self._reserved:
+            log.warn("Try to release a nonreserved cookie %s" % cookie)
+            return
+
+        self._reserved.remove(cookie)
+        if cookie < self._next:
+            self._free.append(cookie)
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+scn.flowBatcher
+~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+from pox.lib.revent import EventHalt
+from pox.openflow.flow_table import TableEntry
+import pox.openflow.libopenflow_01 as of
+
+log = core.getLogger()
+NAME = 'flowBatcher'
+
+ADD           = of.OFPFC_ADD
+REMOVE        = of.OFPFC_DELETE
+REMOVE_STRICT = of.OFPFC_DELETE_STRICT
+
+
+class FlowTransaction:
+    """flow-mods collected between FlowBatcher.begin and FlowBatcher.commit.
+    """
+
+    def __init__(self):
+        # { ofs: [(TableEntry, command), ...], ...}
+        self.ops = {}
+        # [ callable(success), ...]
+        self.callbacks = []
+        # barrier xids not confirmed yet
+        self.pending = set()
+        self.success = True
+
+    def add(self, ofs, entries, command):
+        if not isinstance(entries, (list, tuple)):
+            entries = [entries]
+        self.ops.setdefault(ofs, []).extend((entry, command) for entry in entries)
+
+    def done(self):
+        log.debug("flow transaction done (success = %s)" % self.success)
+        for callback in self.callbacks:
+            try:
+                callback(self.success)
+            except Exception as inst:
+                log.exception(inst)
+
+
+class FlowBatch:
+    """flow-mods sent to one switch, confirmed by one barrier.
+    """
+
+    def __init__(self, ofs, ops, transaction):
+        self.ofs = ofs
+        self.ops = ops
+        self.transaction = transaction
+        self.xids = set() # flow_mod xids, to match ErrorIn
+        self.barrier = of.ofp_barrier_request()
+
+
+class FlowBatcher:
+    """Per switch flow-mod batcher.
+        flow-mods of a transaction are packed into one buffer per switch,
+        followed by a barrier request, and sent with a single write.
+        the flow table mirror of the switch is updated and callbacks
+        are called when barrier replies are received.
+
+          core.flowBatcher.begin()
+          core.flowBatcher.install(ofs, entries)
+          core.flowBatcher.removeStrict(ofs, entries)
+          core.flowBatcher.commit(callback)
+
+        transactions can be nested, flow-mods are sent by the outermost
+        commit. without begin, each call is sent at once.
+
+        with scn.routeSnapshot, when a switch connects its flows are
+        adopted instead of wiped: flows matching the mirror (cookie,
+        match, priority, actions) are kept, other flows with a cookie are
+        removed and missing entries of the mirror are installed. flows
+        without cookie are left to the components that installed them.
+    """
+
+    def __init__(self):
+        self._transaction = None
+        self._depth = 0
+        # { barrier xid: FlowBatch, ...}
+        self._batches = {}
+        # { flow_mod xid: barrier xid, ...}
+        self._flowXids = {}
+        # { dpid: flow stats request xid, ...} switchs being adopted
+        self._adopting = {}
+
+        core.openflow.addListenerByName("BarrierIn", self._handle_BarrierIn)
+        core.openflow.addListenerByName("ErrorIn", self._handle_ErrorIn)
+        core.openflow.addListenerByName("ConnectionDown", self._handle_ConnectionDown)
+        # after the switch entity is created by the topology
+        core.openflow.addListenerByName("ConnectionUp", self._handle_ConnectionUp, priority=-1)
+        # before the stats listeners, adoption replies are not polls
+        core.openflow.addListenerByName("FlowStatsReceived", self._handle_FlowStatsReceived, priority=1)
+
+#_____________________________________________________________________________#
+
+    def begin(self):
+        """start (or join) a transaction.
+        """
+        if self._depth == 0:
+            self._transaction = FlowTransaction()
+        self._depth += 1
+
+
+    def commit(self, callback=None):
+        """end a transaction.
+            callback -- callable(success) called when all switchs of the
+                        outermost transaction have confirmed their flow-mods.
+        """
+        if self._depth == 0:
+            log.warn("commit without begin")
+            if callback:
+                callback(True)
+            return
+
+        if callback:
+            self._transaction.callbacks.append(callback)
+
+        self._depth -= 1
+        if self._depth > 0:
+            return
+
+        transaction = self._transaction
+        self._transaction = None
+        self._send(transaction)
+
+
+    def install(self, ofs, entries):
+        self._queue(ofs, entries, ADD)
+
+
+    def removeStrict(self, ofs, entries):
+        self._queue(ofs, entries, REMOVE_STRICT)
+
+
+    def removeWithWildcards(self, ofs, entries):
+        self._queue(ofs, entries, REMOVE)
+
+
+    def isPending(self, dpid):
+        """True while flow-mods sent to the switch are not confirmed
+            or its flows are being adopted.
+        """
+        if dpid in self._adopting:
+            return True
+        return any(batch.ofs.dpid == dpid for batch in self._batches.itervalues())
+
+#_____________________________________________________________________________#
+
+    def _handle_BarrierIn(self, event):
+        batch = self._batches.pop(event.xid, None)
+        if batch is None:
+            return # not ours
+        self._forget(batch)
+
+        table = batch.ofs.flow_table.flow_table
+        for entry, command in batch.ops:
+            if command == ADD:
+                table.remove_matching_entries(entry.match, entry.priority, strict=True)
+                table.add_entry(entry)
+            else:
+                table.remove_matching_entries(entry.match, entry.priority,
+                                              strict=(command == REMOVE_STRICT))
+        if core.hasComponent('routeSnapshot'):
+            core.routeSnapshot.flowsChanged(batch.ofs.dpid)
+
+        self._confirm(batch)
+
+
+    def _handle_ErrorIn(self, event):
+        barrierXid = self._flowXids.get(event.xid)
+        if barrierXid is None:
+            return
+        batch = self._batches[barrierXid]
+        log.error("flow-mod rejected by %s: %s" % (batch.ofs.dpid, event.asString()))
+        batch.transaction.success = False
+
+
+    def _handle_ConnectionDown(self, event):
+        for xid, batch in self._batches.items():
+            if batch.ofs.dpid != event.dpid:
+                continue
+            log.warn("switch %s disconnected before barrier reply" % event.dpid)
+            del self._batches[xid]
+            self._forget(batch)
+            batch.transaction.success = False
+            self._confirm(batch)
+        self._adopting.pop(event.dpid, None)
+
+
+    def _handle_ConnectionUp(self, event):
+        if not core.hasComponent('routeSnapshot'):
+            return # switch wiped by OFSyncFlowTable
+        ofs = core.topology.getOFS(event.dpid)
+        if ofs is None:
+            return
+        table = ofs.flow_table.flow_table
+        if not table.entries:
+            for entry in core.routeSnapshot.popSwitchFlows(event.dpid):
+                table.add_entry(entry)
+
+        request = of.ofp_stats_request(body=of.ofp_flow_stats_request())
+        self._adopting[event.dpid] = request.xid
+        event.connection.send(request)
+
+
+    def _handle_FlowStatsReceived(self, event):
+        dpid = event.connection.dpid
+        if self._adopting.get(dpid) != event.ofp[0].xid:
+            return # not ours
+        del self._adopting[dpid]
+
+        ofs = core.topology.getOFS(dpid)
+        if ofs is None:
+            return EventHalt
+
+        # { cookie: [TableEntry, ...], ...}
+        expected = {}
+        for entry in ofs.flow_table.flow_table.entries:
+            expected.setdefault(entry.cookie, []).append(entry)
+
+        adopted = set()
+        stale = []
+        for stat in event.stats:
+            if not stat.cookie:
+                continue
+            for entry in expected.get(stat.cookie, ()):
+                if (entry.priority == stat.priority and entry.match == stat.match
+                        and entry.actions == stat.actions):
+                    adopted.add(id(entry))
+                    break
+            else:
+                stale.append(TableEntry(priority=stat.priority, cookie=stat.cookie, match=stat.match))
+
+        missing = [entry for entries in expected.itervalues() for entry in entries
+                   if id(entry) not in adopted]
+        log.info("switch %s: %d flows adopted, %d removed, %d installed"
+                 % (dpid, len(adopted), len(stale), len(missing)))
+
+        self.begin()
+        if stale:
+            self.removeStrict(ofs, stale)
+        if missing:
+            self.install(ofs, missing)
+        self.commit()
+        return EventHalt
+
+#_____________________________________________________________________________#
+
+    def _queue(self, ofs, entries, command):
+        if self._depth > 0:
+            self._transaction.add(ofs, entries, command)
+            return
+
+        transaction = FlowTransaction()
+        transaction.add(ofs, entries, command)
+        self._send(transaction)
+
+
+    def _send(self, transaction):
+        for ofs, ops in transaction.ops.iteritems():
+            if not ops:
+                continue
+
+            connection = ofs._connection # _connection is protected.
+            if connection is None:
+                log.warn("switch %s is not connected, %d flow-mods dropped" % (ofs.dpid, len(ops)))
+                transaction.success = False
+                continue
+
+            batch = FlowBatch(ofs, ops, transaction)
+            data = []
+            for entry, command in ops:
+                msg = entry.to_flow_mod(command=command)
+                batch.xids.add(msg.xid)
+                data.append(msg.pack())
+            data.append(batch.barrier.pack())
+
+            barrierXid = batch.barrier.xid
+            self._batches[barrierXid] = batch
+            for xid in batch.xids:
+                self._flowXids[xid] = barrierXid
+            transaction.pending.add(barrierXid)
+
+            log.debug("send %d flow-mods to %s (barrier xid = %s)" % (len(ops), ofs.dpid, barrierXid))
+            connection.send(''.join(data))
+
+        if not transaction.pending:
+            transaction.done()
+
+
+    def _confirm(self, batch):
+        transaction = batch.transaction
+        transaction.pending.discard(batch.barrier.xid)
+        if not transaction.pending:
+            transaction.done()
+
+
+    def _forget(self, batch):
+        for xid in batch.xids:
+            self._flowXids.pop(xid, None)
+
+
+def launch():
+    if core.hasComponent(NAME):
+        return None
+
+    comp = FlowBatcher()
+    core.register(NAME, comp)
+    return comp
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+scn.meshMaintainer
+~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+from pox.lib.addresses import IPAddr
+from pox.openflow.flow_table import TableEntry
+import pox.openflow.libopenflow_01 as of
+
+from scn.parser import IP, INTFNAME
+from scn.pathSearch import shortestPathTree, treePath
+
+log = core.getLogger()
+
+MESH_PREFIX = 24 # default prefix length of edge subnets
+PREFIX      = 'PREFIX'
+
+
+class MeshTree:
+    """shortest path tree of the mesh toward one destination host.
+    """
+
+    def __init__(self, dst, dstdpid, dstmac, outport, msg, **kwargs):
+        self.dst = dst
+        self.dstdpid = dstdpid # switch adjacent to the host (root)
+        self.dstmac = dstmac
+        self.outport = outport
+
+        # flow_mod template of transit entries
+        self.msg = msg
+        # entry of the root switch, rewrites dst mac
+        self.lastEntry = None
+        self.kwargs = kwargs
+
+        # { dpid: distance to root, ...}
+        self.distances = {}
+        # { dpid: next dpid toward root, ...}
+        self.nextHops = {}
+        # prefix length when dst is an edge subnet
+        self.prefix = None
+        # subnet (dst of a prefix tree) forwarding toward this host
+        self.covered = None
+
+
+class MeshMaintainer:
+    """Keep mesh routes (Routing.mesh) up to date.
+        a destination is added by build(), then its tree is recomputed
+        when a link it uses is removed, when an added link shortens it,
+        or when the host moves. only switchs whose next hop changed get
+        a flow-mod, other mesh routes are only updated in Routing.
+
+        with aggregate, transit switchs get one wildcarded nw_dst entry
+        per edge subnet (prefix tree, lower priority) instead of one
+        entry per host; exact host entries stay on the last hop switch.
+        a prefix tree is rooted at the switch and port configured for
+        the subnet. hosts found outside of that switch fall back to
+        their own exact tree.
+    """
+
+    def __init__(self, routing, aggregate=False, prefix=MESH_PREFIX):
+        self.routing = routing
+        # { dst: MeshTree, ...} (host ip or subnet address)
+        self.trees = {}
+        self.aggregate = aggregate
+        # [(network, prefix, switch IP, port name), ...] edge subnets
+        self.subnets = []
+        if aggregate:
+            self.subnets = self.loadSubnets(prefix)
+
+        if core.hasComponent('scnHostTracker'):
+            core.scnHostTracker.addListenerByName("HostMovedEv", self._handle_HostMovedEv)
+
+#_____________________________________________________________________________#
+
+    def isMeshRoute(self, route):
+        return route.path is not None and route.path.src is None
+
+
+    def loadSubnets(self, prefix=MESH_PREFIX):
+        """get edge subnets from IP (and PREFIX) of the ports sections,
+            with the switch (IP) and port (NAME) they are configured on.
+        """
+        subnets = []
+        if not core.hasComponent('parser'):
+            return subnets
+
+        parser = core.parser
+        for section in parser.getSwitchsSections():
+            for port in parser.getPortsSections(section):
+                ip = parser.getValue(port, IP)
+                if not ip:
+                    continue
+                try:
+                    length = int(parser.getValue(port, PREFIX) or prefix)
+                    network = self._network(IPAddr(ip), length)
+                except Exception as inst:
+                    log.warn("invalid subnet of %s: %s" % (port, inst))
+                    continue
+                if any(subnet[:2] == (network, length) for subnet in subnets):
+                    log.warn("subnet %s/%d of %s already configured" % (network, length, port))
+                    continue
+                subnets.append((network, length, parser.getValue(section, IP),
+                                parser.getValue(port, INTFNAME)))
+
+        log.info("mesh aggregation subnets: %s" % ", ".join(
+                    "%s/%d" % subnet[:2] for subnet in subnets))
+        return subnets
+
+
+    def build(self, dst, dstdpid, dstmac, outport, msg, graph=None, **kwargs):
+        """create mesh routes toward dst.
+            msg -- flow_mod of the root switch (match and timeouts are
+                   used for all entries of the mesh).
+        """
+        mesh = self.routing.mesh.setdefault(dst, {})
+
+        tree = MeshTree(dst, dstdpid, dstmac, outport, msg, **kwargs)
+        tree.lastEntry = TableEntry.from_flow_mod(msg)
+        msg.match = msg.match.clone() # lastEntry keeps its own match
+        msg.match.nw_tos = 0
+        self.trees[dst] = tree
+
+        core.flowBatcher.begin()
+        try:
+            # Flow to the node from the adjacent switch
+            if dstdpid not in mesh:
+                ofs = core.topology.getOFS(dstdpid)
+                core.flowBatcher.install(ofs, tree.lastEntry)
+                mesh[dstdpid] = 0
+
+            prefixTree = self._getPrefixTree(tree, graph)
+            if prefixTree is not None:
+                tree.covered = prefixTree.dst
+            else:
+                self.refresh(tree, graph)
+        finally:
+            core.flowBatcher.commit()
+
+
+    def refresh(self, tree, graph=None):
+        """recompute the tree and update mesh routes whose via changed.
+        """
+        if tree.covered is not None:
+            return # forwarded by the prefix tree
+
+        if graph is None:
+            graph = self.routing.getUsedBwGraph(self.routing.forceRoute)
+
+        tree.distances, tree.nextHops = shortestPathTree(graph, tree.dstdpid)
+        mesh = self.routing.mesh[tree.dst]
+
+        # all switchs send their flow-mods in one write per switch
+        core.flowBatcher.begin()
+        try:
+            for sw in core.topology.getSwitchs():
+                if sw.dpid == tree.dstdpid:
+                    continue
+                self._refreshSwitch(tree, mesh, sw.dpid)
+        finally:
+            core.flowBatcher.commit()
+
+
+    def linkAdded(self, link):
+        """refresh trees which the new link makes shorter.
+        """
+        graph = self.routing.getUsedBwGraph(self.routing.forceRoute)
+        weight = graph.get(link.dpid1, {}).get(link.dpid2)
+        if weight is None:
+            return
+
+        for tree in self.trees.values():
+            distance2 = tree.distances.get(link.dpid2)
+            if distance2 is None:
+                continue # link does not lead to root
+            distance1 = tree.distances.get(link.dpid1)
+            if distance1 is not None and distance1 <= distance2 + weight:
+                continue
+            log.debug("link %s shortens mesh toward %s" % (link, tree.dst))
+            self.refresh(tree, graph)
+
+
+    def linkRemoved(self, link):
+        """refresh trees which used the removed link.
+        """
+        dsts = set()
+        for cookie in self.routing.getCookiesByLink(link):
+            route = self.routing.getRoute(cookie)
+            if self.isMeshRoute(route):
+                dsts.add(route.path.dst)
+
+        graph = self.routing.getUsedBwGraph(self.routing.forceRoute)
+        for dst in dsts:
+            tree = self.trees.get(dst)
+            if tree is None:
+                continue
+            log.debug("link %s removed from mesh toward %s" % (link, dst))
+            self.refresh(tree, graph)
+
+#_____________________________________________________________________________#
+
+    def _handle_HostMovedEv(self, event):
+        host = event.host
+        tree = self.trees.get(host.ipAddr)
+        if tree is None:
+            return
+
+        newOfs = host.ofp.ofs
+        mesh = self.routing.mesh[tree.dst]
+        log.info("mesh root of %s moves to %s:%s" % (tree.dst, newOfs.dpid, host.ofp.number))
+
+        core.flowBatcher.begin()
+        try:
+            if newOfs.dpid != tree.dstdpid:
+                # old root switch becomes a transit switch
+                oldOfs = core.topology.getOFS(tree.dstdpid)
+                if oldOfs is not None:
+                    core.flowBatcher.removeStrict(oldOfs, tree.lastEntry)
+                mesh.pop(tree.dstdpid, None)
+
+                # new root switch is not a transit switch any more
+                route = self._getMeshRoute(mesh, newOfs.dpid)
+                if route is not None:
+                    self._removeMeshRoute(mesh, newOfs.dpid, route)
+
+            tree.dstdpid = newOfs.dpid
+            tree.outport = host.ofp.number
+            prefixTree = self.trees.get(tree.covered)
+            if prefixTree is not None and prefixTree.dstdpid != tree.dstdpid:
+                log.info("%s left subnet switch, use exact mesh" % tree.dst)
+                tree.covered = None
+            tree.lastEntry = self._createEntry(tree, tree.lastEntry.match, [
+                    of.ofp_action_dl_addr.set_dst(tree.dstmac),
+                    of.ofp_action_output(port=tree.outport, max_len=0)
+                ])
+            core.flowBatcher.install(newOfs, tree.lastEntry)
+            mesh[newOfs.dpid] = 0
+
+            self.refresh(tree)
+        finally:
+            core.flowBatcher.commit()
+
+#_____________________________________________________________________________#
+
+    def _refreshSwitch(self, tree, mesh, dpid):
+        route = self._getMeshRoute(mesh, dpid)
+
+        hops = treePath(tree.nextHops, dpid, tree.dstdpid)
+        if not hops:
+            if route is not None:
+                log.warn("switch %s can not reach %s any more" % (dpid, tree.dst))
+                self._removeMeshRoute(mesh, dpid, route)
+            return
+
+        via = [self.routing.usedBwGraph.getLink(dpid1, dpid2) for dpid1, dpid2 in hops]
+        lastEntity = self._lastEntity(tree)
+        if route is not None and list(route.links) == via and route.lastEntity == lastEntity:
+            return # untouched
+
+        newRoute = self._createRoute(tree, via)
+        first = via[0].ofs1
+        if route is None:
+            # downstream entries are the first hop entries of the routes
+            # of downstream switchs, only the first hop one is sent.
+            self.routing.addRoute(newRoute, install=False)
+            if newRoute.cookie is None:
+                return
+            mesh[dpid] = newRoute.cookie
+            core.flowBatcher.install(first, newRoute.entries[first])
+            return
+
+        newRoute.cookie = route.cookie
+        for tabEntry in newRoute.entries.itervalues():
+            tabEntry.cookie = route.cookie
+        self.routing._replaceRoute(route, newRoute)
+
+        oldEntry = route.entries.get(first)
+        newEntry = newRoute.entries[first]
+        if oldEntry is None or oldEntry.actions != newEntry.actions:
+            core.flowBatcher.install(first, newEntry)
+
+
+    def _createRoute(self, tree, via):
+        from scn.routing import ScnRoute, ScnLinks, Path
+
+        route = ScnRoute()
+        route.links = ScnLinks(via)
+        route.path = Path.create(None, tree.dst, **tree.kwargs)
+        for link in via:
+            route.entries[link.ofs1] = self._createEntry(tree, tree.msg.match,
+                    [of.ofp_action_output(port=link.ofp1.number, max_len=0)])
+
+        # use for jsonLogger
+        route.lastEntity = self._lastEntity(tree)
+        return route
+
+
+    def _lastEntity(self, tree):
+        if tree.lastEntry is None:
+            return None # prefix tree, no last hop entry
+        return tree.lastEntry.actions[1]
+
+
+    def _getPrefixTree(self, tree, graph=None):
+        """get (or build) the prefix tree forwarding toward tree.dst.
+            None when not aggregated, when the switch of the subnet is
+            not connected, or when the host is not on it.
+        """
+        if not self.aggregate or not isinstance(tree.dst, IPAddr):
+            return None
+
+        for network, length, switchIp, portName in self.subnets:
+            if self._network(tree.dst, length) == network:
+                break
+        else:
+            return None
+
+        prefixTree = self.trees.get(network)
+        if prefixTree is not None:
+            if prefixTree.dstdpid != tree.dstdpid:
+                return None
+            return prefixTree
+
+        root = self._subnetPort(switchIp, portName)
+        if root is None:
+            log.debug("switch of %s/%d not connected" % (network, length))
+            return None
+        if root.ofs.dpid != tree.dstdpid:
+            log.info("%s is not on the switch of %s/%d, use exact mesh" % (tree.dst, network, length))
+            return None
+
+        msg = of.ofp_flow_mod()
+        msg.match = tree.msg.match.clone()
+        msg.match.set_nw_dst(network, length)
+        # host entries (exact nw_dst) take precedence
+        msg.priority = tree.msg.priority - 1
+        msg.idle_timeout = of.OFP_FLOW_PERMANENT
+        msg.hard_timeout = of.OFP_FLOW_PERMANENT
+
+        prefixTree = MeshTree(network, root.ofs.dpid, None, root.number, msg, **tree.kwargs)
+        prefixTree.prefix = length
+        self.trees[network] = prefixTree
+        # kept if restored by scn.routeSnapshot
+        self.routing.mesh.setdefault(network, {})
+        log.info("create mesh toward %s/%d from %s" % (network, length, tree.dstdpid))
+
+        self.refresh(prefixTree, graph)
+        return prefixTree
+
+
+    def _subnetPort(self, switchIp, portName):
+        """get the ScnOpenFlowPort of a subnet, None if not connected.
+        """
+        for ofs in core.topology.getSwitchs():
+            try:
+                if ofs.ipaddr != switchIp:
+                    continue
+            except Exception:
+                continue # not connected
+            for port in ofs.getPorts():
+                if port.name == portName:
+                    return port
+        return None
+
+
+    def _network(self, ip, length):
+        mask = ((1 << length) - 1) << (32 - length)
+        return IPAddr(ip.toUnsigned() & mask)
+
+
+    def _createEntry(self, tree, match, actions):
+        msg = tree.msg
+        return TableEntry(priority = msg.priority,
+                          idle_timeout = msg.idle_timeout,
+                          hard_timeout = msg.hard_timeout,
+                          match = match,
+                          actions = actions)
+
+
+    def _getMeshRoute(self, mesh, dpid):
+        cookie = mesh.get(dpid)
+        if not cookie:
+            return None
+        return self.routing.getRoute(cookie)
+
+
+    def _removeMeshRoute(self, mesh, dpid, route):
+        """remove the first hop entry of route, other entries belong
+            to downstream switchs.
+        """
+        first = route.links.firstSwitch()
+        tabEntry = route.entries.get(first)
+        if tabEntry is not None:
+            core.flowBatcher.removeStrict(first, tabEntry)
+        self.routing.delRoute(route, remove=False)
+        del mesh[dpid]
@@ -77,6 +77,9 @@ def launch(inifile=None):
     from scn.scnOFTopology import launch as of_topology_launch
     of_topology_launch()
 
+    from scn.flowBatcher import launch as flow_batcher_launch
+    flow_batcher_launch()
+
     from scn.scnDiscovery import launch as discovery_launch
     discovery_launch()
 
@@ -89,6 +92,16 @@ def launch(inifile=None):
     from scn.routing import launch as routing_launch
     routing_launch()
 
+    processes = core.parser.getValue('ROUTING', 'COMPUTE_PROCESSES') if core.hasComponent('parser') else None
+    if processes and int(processes) > 0:
+        from scn.computeService import launch as compute_service_launch
+        compute_service_launch(processes)
+
+    snapshotFile = core.parser.getValue('ROUTING', 'SNAPSHOT_FILE') if core.hasComponent('parser') else None
+    if snapshotFile:
+        from scn.routeSnapshot import launch as route_snapshot_launch
+        route_snapshot_launch(snapshotFile)
+
     from log.level import launch as log_level_launch
     log_level_launch(WARNING=True)
     #log_level_launch(INFO=True)
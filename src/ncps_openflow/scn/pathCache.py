@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+scn.pathCache
+~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+
+log = core.getLogger()
+
+MINBW_STEP = 10**6 # minBw bucket (bits/s)
+
+
+class PathCache:
+    """Cache of Routing.getVia results.
+        entries are keyed by (srcdpid, dstdpid, minBw bucket, logic) and
+        are valid for one epoch of UsedBwGraph: (topologyEpoch, bwEpoch).
+        topologyEpoch changes when a link is added or removed, bwEpoch
+        when the utilization of a link crosses a UTIL_STEP boundary.
+        all entries are dropped when the epoch changes.
+    """
+
+    def __init__(self, usedBwGraph, minBwStep=MINBW_STEP):
+        self.usedBwGraph = usedBwGraph
+        self.minBwStep = minBwStep
+
+        # { key: (minBw, via), ...}
+        self._entries = {}
+        self._epoch = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def key(self, srcdpid, dstdpid, minBw=None, logic=None, forceRoute=False):
+        bucket = None
+        if minBw:
+            bucket = int(minBw // self.minBwStep)
+        return (srcdpid, dstdpid, bucket, logic, bool(forceRoute))
+
+
+    def get(self, key, minBw=None):
+        """return (True, via) on hit, (False, None) on miss.
+            a cached via is used for minBw if its links have minBw residual
+            bandwidth, a cached None (no feasible via) if it was computed
+            for minBw or less.
+        """
+        self.__checkEpoch__()
+        entry = self._entries.get(key)
+        if entry is not None:
+            cachedMinBw, via = entry
+            if via is None:
+                if (cachedMinBw or 0) <= (minBw or 0):
+                    self.hits += 1
+                    return True, None
+            elif not minBw or all(self.usedBwGraph.getResidual(link) >= minBw for link in via):
+                self.hits += 1
+                return True, list(via)
+
+        self.misses += 1
+        return False, None
+
+
+    def put(self, key, minBw, via):
+        self.__checkEpoch__()
+        if via is not None:
+            via = tuple(via)
+        self._entries[key] = (minBw, via)
+
+
+    def clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries = {}
+
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = 100. * self.hits / total if total else 0.
+        return {'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': ratio,
+                'invalidations': self.invalidations,
+                'topologyEpoch': self.usedBwGraph.topologyEpoch,
+                'bwEpoch': self.usedBwGraph.bwEpoch}
+
+#_____________________________________________________________________________#
+
+    def __checkEpoch__(self):
+        epoch = (self.usedBwGraph.topologyEpoch, self.usedBwGraph.bwEpoch)
+        if epoch == self._epoch:
+            return
+        if self._entries:
+            log.debug("path cache invalidated, epoch %s -> %s" % (self._epoch, epoch))
+        self.clear()
+        self._epoch = epoch
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+scn.pathSearch
+~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+import heapq
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # allPairsNextHops is not available
+
+INFINITY = float('inf')
+
+
+def dijkstra(graph, src, dst=None):
+    """single source shortest paths with a binary heap.
+        graph[dict] -- weighted adjacency {node: {node: weight, ...}, ...}
+        src         -- start node.
+        dst         -- stop as soon as dst is settled. (None -> settle all nodes)
+
+        return (distances, predecessors)
+          distances    -- {node: distance from src, ...} (reached nodes only)
+          predecessors -- {node: previous node on the shortest path, ...}
+    """
+    distances = {src: 0}
+    predecessors = {}
+    settled = set()
+    heap = [(0, src)]
+
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if node in settled:
+            continue # stale heap entry
+        settled.add(node)
+
+        if node == dst:
+            break
+
+        for child, weight in graph.get(node, {}).iteritems():
+            newDistance = distance + weight
+            if newDistance < distances.get(child, INFINITY):
+                distances[child] = newDistance
+                predecessors[child] = node
+                heapq.heappush(heap, (newDistance, child))
+
+    return distances, predecessors
+
+
+def shortestPath(graph, src, dst):
+    """search the shortest path between src and dst.
+        graph[dict] -- weighted adjacency {node: {node: weight, ...}, ...}
+
+        return [(node, next node, weight), ...] from src to dst.
+        return [] if dst is not reachable from src.
+    """
+    if src == dst or src not in graph:
+        return []
+
+    _, predecessors = dijkstra(graph, src, dst)
+    if dst not in predecessors:
+        return []
+
+    path = []
+    node = dst
+    while node != src:
+        previous = predecessors[node]
+        path.append((previous, node, graph[previous][node]))
+        node = previous
+    path.reverse()
+
+    return path
+
+
+def equalCostPaths(graph, src, dst, limit=None):
+    """enumerate all the shortest paths between src and dst.
+        weights must be positive, so that the shortest path DAG has no cycle.
+        limit -- maximum number of paths. (None -> all)
+
+        return [[(node, next node, weight), ...], ...]
+    """
+    if src == dst or src not in graph:
+        return []
+
+    distances, _ = dijkstra(graph, src)
+    if dst not in distances:
+        return []
+
+    # predecessors on the shortest path DAG
+    # { node: [(previous node, weight), ...], ...}
+    predecessors = {}
+    for node, children in graph.iteritems():
+        if node not in distances:
+            continue
+        for child, weight in children.iteritems():
+            if distances[node] + weight == distances.get(child):
+                predecessors.setdefault(child, []).append((node, weight))
+
+    paths = []
+    stack = [(dst, [])]
+    while stack:
+        node, tail = stack.pop()
+        if node == src:
+            paths.append(tail)
+            if limit is not None and len(paths) >= limit:
+                break
+            continue
+        for previous, weight in sorted(predecessors.get(node, ()), reverse=True):
+            stack.append((previous, [(previous, node, weight)] + tail))
+
+    return paths
+
+
+def shortestPaths(graph, pairs):
+    """search the shortest paths of several (src, dst) pairs.
+        (module level, can run in a scn.computeService worker)
+
+        return {(src, dst): shortestPath(graph, src, dst), ...}
+    """
+    return dict((pair, shortestPath(graph, pair[0], pair[1])) for pair in pairs)
+
+
+def allPairsNextHops(graph):
+    """all pairs shortest paths by a vectorized Floyd-Warshall. (numpy)
+        graph[dict] -- weighted adjacency {node: {node: weight, ...}, ...}
+
+        return (index, nodes, distances, nextHops)
+          index     -- {node: dense index, ...}
+          nodes     -- [node, ...] by index
+          distances -- distances[i, j] from node i to node j (inf: unreachable)
+          nextHops  -- nextHops[i, j] index of the node after i toward j
+                       (-1: unreachable)
+    """
+    nodes = set(graph)
+    for row in graph.itervalues():
+        nodes.update(row)
+    nodes = sorted(nodes)
+    index = dict((node, i) for i, node in enumerate(nodes))
+    size = len(nodes)
+
+    distances = numpy.full((size, size), numpy.inf)
+    nextHops = numpy.full((size, size), -1, dtype=numpy.int32)
+    for node, row in graph.iteritems():
+        i = index[node]
+        for child, weight in row.iteritems():
+            j = index[child]
+            if weight < distances[i, j]:
+                distances[i, j] = weight
+                nextHops[i, j] = j
+    numpy.fill_diagonal(distances, 0)
+    numpy.fill_diagonal(nextHops, numpy.arange(size))
+
+    for k in xrange(size):
+        through = distances[:, k, None] + distances[None, k, :]
+        better = through < distances
+        distances = numpy.where(better, through, distances)
+        nextHops = numpy.where(better, nextHops[:, k, None], nextHops)
+
+    return index, nodes, distances, nextHops
+
+
+def tablePath(table, graph, src, dst):
+    """follow the nextHops of allPairsNextHops from src to dst.
+        return [(node, next node, weight), ...] like shortestPath.
+        return None if a next hop is not an edge of graph (table older
+        than graph).
+    """
+    index, nodes, distances, nextHops = table
+    if src == dst or src not in index or dst not in index:
+        return []
+
+    i = index[src]
+    j = index[dst]
+    path = []
+    while i != j:
+        k = nextHops[i, j]
+        if k < 0 or len(path) >= len(nodes):
+            return []
+        node, child = nodes[i], nodes[k]
+        weight = graph.get(node, {}).get(child)
+        if weight is None:
+            return None
+        path.append((node, child, weight))
+        i = k
+    return path
+
+
+def reverseGraph(graph):
+    """reverse all edges. {node: {node: weight}} -> {node: {node: weight}}
+    """
+    reverse = {}
+    for node, row in graph.iteritems():
+        for child, weight in row.iteritems():
+            reverse.setdefault(child, {})[node] = weight
+    return reverse
+
+
+def shortestPathTree(graph, root):
+    """shortest paths from every node to root with one Dijkstra
+        on the reversed graph.
+        graph[dict] -- weighted adjacency {node: {node: weight, ...}, ...}
+
+        return (distances, nextHops)
+          distances -- {node: distance to root, ...} (nodes reaching root only)
+          nextHops  -- {node: next node toward root, ...}
+    """
+    return dijkstra(reverseGraph(graph), root)
+
+
+def treePath(nextHops, src, root):
+    """follow nextHops of shortestPathTree from src to root.
+        return [(node, next node), ...], [] if src does not reach root.
+    """
+    path = []
+    node = src
+    while node != root:
+        nextNode = nextHops.get(node)
+        if nextNode is None or len(path) > len(nextHops):
+            return []
+        path.append((node, nextNode))
+        node = nextNode
+    return path
+
+
+def widestPath(graph, src, dst):
+    """search the widest (maximum bottleneck) path between src and dst.
+        graph[dict] -- capacity adjacency {node: {node: capacity, ...}, ...}
+        among the widest paths, the one with the fewest hops is returned.
+
+        return [(node, next node, capacity), ...] from src to dst.
+        return [] if dst is not reachable from src.
+    """
+    if src == dst or src not in graph:
+        return []
+
+    # 1. largest bottleneck, Dijkstra maximizing the minimum capacity
+    widths = {src: INFINITY}
+    settled = set()
+    heap = [(-INFINITY, src)]
+    while heap:
+        negWidth, node = heapq.heappop(heap)
+        if node in settled:
+            continue # stale heap entry
+        settled.add(node)
+
+        if node == dst:
+            break
+
+        for child, capacity in graph.get(node, {}).iteritems():
+            width = min(-negWidth, capacity)
+            if width > widths.get(child, -INFINITY):
+                widths[child] = width
+                heapq.heappush(heap, (-width, child))
+
+    if dst not in settled:
+        return []
+    width = widths[dst]
+
+    # 2. fewest hops using only edges as wide as the bottleneck
+    predecessors = {src: None}
+    queue = deque([src])
+    while queue and dst not in predecessors:
+        node = queue.popleft()
+        for child, capacity in graph.get(node, {}).iteritems():
+            if capacity >= width and child not in predecessors:
+                predecessors[child] = node
+                queue.append(child)
+
+    path = []
+    node = dst
+    while node != src:
+        previous = predecessors[node]
+        path.append((previous, node, graph[previous][node]))
+        node = previous
+    path.reverse()
+
+    return path
+
+
+def bottleneck(path):
+    """smallest weight of a path returned by widestPath.
+    """
+    if not path:
+        return 0
+    return min(weight for _, _, weight in path)
+
+
+def pathCost(path):
+    """sum of weights of a path returned by shortestPath.
+    """
+    return sum(weight for _, _, weight in path)
+
+
+def kShortestPaths(graph, src, dst, k):
+    """search k shortest loopless paths between src and dst (Yen's algorithm).
+        graph[dict] -- weighted adjacency {node: {node: weight, ...}, ...}
+        k[int]      -- maximum number of paths.
+
+        return [path, ...] sorted by cost, path is like shortestPath result.
+    """
+    first = shortestPath(graph, src, dst)
+    if not first or k < 1:
+        return []
+
+    paths = [first]
+    found = set([_nodes(first)])
+    candidates = [] # heap of (cost, hops, nodes, path)
+
+    while len(paths) < k:
+        previous = paths[-1]
+        previousNodes = _nodes(previous)
+
+        for i in xrange(len(previous)):
+            spurNode = previousNodes[i]
+            rootNodes = previousNodes[:i + 1]
+            rootPath = previous[:i]
+
+            # edges leaving the root of already found paths are not usable
+            edges = set()
+            for path in paths:
+                nodes = _nodes(path)
+                if nodes[:i + 1] == rootNodes:
+                    edges.add((nodes[i], nodes[i + 1]))
+
+            pruned = PrunedGraph(graph, rootNodes[:-1], edges)
+            spurPath = shortestPath(pruned, spurNode, dst)
+            if not spurPath:
+                continue
+
+            path = rootPath + spurPath
+            nodes = _nodes(path)
+            if nodes in found:
+                continue
+            found.add(nodes)
+            heapq.heappush(candidates, (pathCost(path), len(path), nodes, path))
+
+        if not candidates:
+            break
+
+        paths.append(heapq.heappop(candidates)[3])
+
+    return paths
+
+
+class PrunedGraph(object):
+    """read-only view of a graph without some nodes and edges.
+        it can be given to dijkstra/shortestPath instead of the graph,
+        nothing is copied.
+    """
+
+    def __init__(self, graph, nodes=(), edges=()):
+        self.graph = graph
+        self.nodes = set(nodes)  # removed nodes
+        self.edges = set(edges)  # removed (node, node)
+
+    def get(self, node, default=None):
+        if node in self.nodes or node not in self.graph:
+            return default
+        return dict((child, weight)
+                    for child, weight in self.graph[node].iteritems()
+                    if child not in self.nodes and (node, child) not in self.edges)
+
+    def __contains__(self, node):
+        return node not in self.nodes and node in self.graph
+
+    def __getitem__(self, node):
+        row = self.get(node)
+        if row is None:
+            raise KeyError(node)
+        return row
+
+
+def _nodes(path):
+    """tuple of nodes of a path returned by shortestPath.
+    """
+    if not path:
+        return ()
+    return (path[0][0],) + tuple(child for _, child, _ in path)
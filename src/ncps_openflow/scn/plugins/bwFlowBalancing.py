@@ -17,6 +17,7 @@ from pox.lib.packet.ipv4 import ipv4
 from scn import routing
 from scn.routing import RoutingConditions
 from scn.routing import ScnLinks
+from scn.pathSearch import shortestPath, shortestPaths
 from scn.plugins.flowBw import *
 
 from operator import attrgetter
@@ -27,6 +28,7 @@ NAME = __file__.split('/')[-1].split('.')[0].split('_')[0]
 log = core.getLogger()
 
 BWFLOWBALANCING_PERIOD=15
+COMPUTE_DEADLINE=10 # seconds to wait for core.computeService, then handled inline
 
 ###############################################################################
 
@@ -90,34 +92,87 @@ class BwFlowBalancing(EventMixin):
 
         self.cablesBw = self.getCablesBw()
 
+        if self.handling and core.hasComponent('computeService') \
+                and not core.computeService.isPending(NAME):
+            # the job was replaced or lost, its result will never come
+            log.warn("balancing job lost, handling reset")
+            self.handling = False
+
         if (not self.handling) and (core.routing.optimizeRequested or self.automaticMode):
             self.handling = True
             core.routing.optimizeRequested = False
 
-            start = time.clock()
-            log.info("Handling started.")
-            # respect conditions algo
-            NGRoutes = self.checkConditions()
-            log.info("checkConditions finished. (time;{0:.3f}".format(time.clock() - start))
+            if core.hasComponent('computeService'):
+                # search vias in a worker, handle the result on the loop
+                try:
+                    pairs = self.getOptimizePairs()
+                    core.computeService.submit(NAME, shortestPaths,
+                                               (core.routing.getUsedBwGraph(), pairs),
+                                               self.handle, COMPUTE_DEADLINE, self.handle)
+                except Exception as inst:
+                    log.exception(inst)
+                    self.handle()
+            else:
+                self.handle()
+
+        if not self.running:
+            self.looping = False
+            return
+
+#_____________________________________________________________________________#
 
-            # best effort algo
-            if NGRoutes or self.alwaysOptimization:
-                self.optimizeFlows()
-                log.info("optimizeFlows finished. (time;{0:.3f}".format(time.clock() - start))
+    def handle(self, paths=None):
+        """one balancing round.
+            paths -- { (srcDpid, dstDpid): shortestPath(), ...} computed
+                     by core.computeService, searched inline if None
+                     (result lost or late: called by the deadline).
+        """
+        start = time.clock()
+        log.info("Handling started.")
 
-            # result confirmation of best effort algo
-            NGRoutes = self.respectBandwidthReservation(NGRoutes)
+        try:
+            # flow-mods of all updated routes are sent at once
+            core.flowBatcher.begin()
+            try:
+                # respect conditions algo
+                NGRoutes = self.checkConditions()
+                log.info("checkConditions finished. (time;{0:.3f}".format(time.clock() - start))
+
+                # best effort algo
+                if NGRoutes or self.alwaysOptimization:
+                    self.optimizeFlows(paths)
+                    log.info("optimizeFlows finished. (time;{0:.3f}".format(time.clock() - start))
+
+                # result confirmation of best effort algo
+                NGRoutes = self.respectBandwidthReservation(NGRoutes)
+            finally:
+                core.flowBatcher.commit()
             if NGRoutes and (not core.routing.optimizeRequested):
                 routes = map(lambda route: route.cookie, NGRoutes)
                 log.debug("No respects. %s" % routes)
                 core.middleware.push_request_optimize_failure(routes)
 
             log.info("Handling finished. (time;{0:.3f}".format(time.clock() - start))
+        finally:
             self.handling = False
 
-        if not self.running:
-            self.looping = False
-            return
+#_____________________________________________________________________________#
+
+    def getOptimizePairs(self):
+        """get (srcDpid, dstDpid) of the routes optimizeFlows may move.
+        """
+        pairs = set()
+        for flowBw in core.flowBw.flowBws.values():
+            if flowBw.bw < 10**3:
+                continue
+            route = core.routing.getRoute(flowBw.cookie)
+            if not route or not route.conditions or not route.links:
+                continue
+            if route.conditions.get(RoutingConditions.fix, False):
+                continue
+            links = ScnLinks(route.links)
+            pairs.add((links.firstSwitch().dpid, links.lastSwitch().dpid))
+        return list(pairs)
 
 #_____________________________________________________________________________#
 
@@ -194,7 +249,7 @@ class BwFlowBalancing(EventMixin):
             theoricalBw = link.getMaxBandwidthTheorical()
             linkBw = self.getSgmtBw(self.cablesBw, (link.dpid1, link.dpid2))
 
-            for cookie in link.cookies:
+            for cookie in core.routing.getCookiesByLink(link):
                 r = core.routing.getRoute(cookie)
 
                 if r.conditions is not None and RoutingConditions.bandwidth in r.conditions.keys():
@@ -221,7 +276,7 @@ class BwFlowBalancing(EventMixin):
         graph = core.routing.getUsedBwGraph()
 
         t1 = datetime.datetime.now()
-        possibleVia = core.routing.getRoutesDijkstra(srcDpid, dstDpid, graph)
+        possibleVia = shortestPath(graph, srcDpid, dstDpid)
         t2 = datetime.datetime.now()
         dt = t2 - t1
         log.info("[ABL] possibleVia Dijkstra [%s] found in %s" % (possibleVia, str(dt)))
@@ -235,7 +290,7 @@ class BwFlowBalancing(EventMixin):
             linkBwAvaillable = link.getBandwidthAvailable()
             linkBwNonReserved = link.getMaxBandwidthTheorical()
 
-            for cookie in link.cookies:
+            for cookie in core.routing.getCookiesByLink(link):
                 route = core.routing.getRoute(cookie)
                 if route is not None:
                     if route.conditions is not None and route.conditions[routing.RoutingConditions.bandwidth] is not None:
@@ -350,7 +405,14 @@ class BwFlowBalancing(EventMixin):
 
         return True
 
-    def optimizeFlows(self):
+    def optimizeFlows(self, paths=None):
+        """move heavy flows to a less loaded via.
+            paths -- vias searched on a graph snapshot. a pair whose
+                     route moved is searched inline afterwards, on the
+                     graph updated by the move.
+        """
+        if paths is not None:
+            paths = dict(paths)
 
         bws=[]
         try:
@@ -379,6 +441,11 @@ class BwFlowBalancing(EventMixin):
             b = conditions.get(RoutingConditions.fix, False)
             if b: continue
 
+            # moved recently or often (core.routing.damper)
+            if not core.routing.damper.canMove(route.cookie):
+                core.routing.damper.suppress(route.cookie, 'balancing')
+                continue
+
             log.debug("============================================================")
             log.debug("optimizedFlow on route %s" % route.cookie)
 
@@ -399,13 +466,17 @@ class BwFlowBalancing(EventMixin):
             ######################################################################################
             ## Dijkstra way to find the possible via
             ######################################################################################
-            graph = core.routing.getUsedBwGraph()
+            if paths is not None and (srcDpid, dstDpid) in paths:
+                # searched by core.computeService on a graph snapshot
+                possibleVia = paths[(srcDpid, dstDpid)]
+            else:
+                graph = core.routing.getUsedBwGraph()
 
-            t1 = datetime.datetime.now()
-            possibleVia = core.routing.getRoutesDijkstra(srcDpid, dstDpid, graph)
-            t2 = datetime.datetime.now()
-            dt = t2 - t1
-            log.debug("[ABL] possibleVia Dijkstra [%s] found in %s" % (possibleVia, str(dt)))
+                t1 = datetime.datetime.now()
+                possibleVia = shortestPath(graph, srcDpid, dstDpid)
+                t2 = datetime.datetime.now()
+                dt = t2 - t1
+                log.debug("[ABL] possibleVia Dijkstra [%s] found in %s" % (possibleVia, str(dt)))
 
             possiblesVias = []
             candidateVia = []
@@ -414,6 +485,10 @@ class BwFlowBalancing(EventMixin):
             for vertex in possibleVia:
                 link = core.openflow_discovery.getLinkByDpid(vertex[0],vertex[1])
                 log.debug('link = %s' % str(link))
+                if link is None:
+                    # link expired after the snapshot
+                    candidateVia = []
+                    break
                 candidateVia.append(link)
 
             if candidateVia != []:
@@ -490,9 +565,10 @@ class BwFlowBalancing(EventMixin):
                 if routeBw!= 0:
                     log.debug('gain percent   = %15.2f%%' % (100.*gain/routeBw))
 
-                log.debug('0.05*(routeBw) = %15.2f' % (routeBw * 0.05))
+                hysteresis = core.routing.damper.hysteresis
+                log.debug('%.2f*(routeBw) = %15.2f' % (hysteresis, routeBw * hysteresis))
 
-                if gain <= routeBw * 0.05:
+                if gain <= routeBw * hysteresis:
                     continue
 
                 log.debug('FOUND A BETTER ROUTE for route with cookie %d' % route.cookie)
@@ -506,6 +582,9 @@ class BwFlowBalancing(EventMixin):
                 # update route
                 self.updateRoute(route, pv)
                 selectedRoute = pv
+                if paths is not None:
+                    # the snapshot does not know this move
+                    paths.pop((srcDpid, dstDpid), None)
 
 #______________________________________________________________________________#
 
@@ -25,6 +25,17 @@ log = core.getLogger()
 #                              Additional classes                              #
 #______________________________________________________________________________#
 
+class FlowBwUpdatedEv(Event):
+
+    EVENT_NAME = 'FlowBwUpdatedEv'
+
+    def __init__(self, dpid, cookies):
+        Event.__init__(self)
+        self.dpid = dpid
+        self.cookies = cookies # cookies whose bandwidth has been updated
+
+#______________________________________________________________________________#
+
 class SegmentBw:
 
     def __init__(self, dpid, pc, bc, t):
@@ -130,6 +141,7 @@ class FlowBw(EventMixin) :
 
     _eventMixin_events = set([
         FlowStatsEv,
+        FlowBwUpdatedEv,
         FlowRemoved
     ])
 
@@ -145,6 +157,7 @@ class FlowBw(EventMixin) :
         stats = event.stats
         dpid  = event.dpid
         ident = event.ident
+        cookies = set()
 
         for stat in  stats:
             cookie =  stat['cookie']
@@ -160,9 +173,13 @@ class FlowBw(EventMixin) :
 
             flowBw.update(dpid, pc, bc, t, cookie, ident)
             self.flowBws[cookie] = flowBw
+            cookies.add(cookie)
             if flowBw.bw > 10**6: # 10MB/s
                 log.debug("flowBw = %s" % str(flowBw))
 
+        if cookies:
+            self.raiseEvent(FlowBwUpdatedEv, dpid, cookies)
+
 
     def _handle_routing_RouteChangedEv(self, event):
         oldRoute = event.oldRoute
@@ -239,6 +256,7 @@ def launch(**kwargs):
     # attach handlers to listners
     core.stats.addListenerByName("FlowStatsEv", comp._handle_FlowStatsEv)
     comp.listenTo(core.routing)
+    core.routing.listenTo(comp)
 
     return comp
 
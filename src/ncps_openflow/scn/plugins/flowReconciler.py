@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+scn.plugins.flowReconciler
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+import time
+
+from pox.core import core
+from pox.lib.revent.revent import EventMixin
+from pox.openflow.flow_table import TableEntry
+
+from scn.plugins.stats import FlowStatsEv
+
+NAME = __file__.split('/')[-1].split('.')[0]
+wantComponents = ['stats']
+
+log = core.getLogger()
+
+RECONCILE_PERIOD = 30 # min seconds between two corrections of a switch
+MAX_FLOW_MODS = 100   # max corrective flow-mods per switch and correction
+
+
+###############################################################################
+
+class FlowReconciler(EventMixin):
+    """Keep switch flow tables in line with the controller view.
+        the flows reported by FlowStatsEv are compared to the permanent
+        entries with a cookie of the flow table mirror of the switch
+        (routes, and middleware paths installed by ScnOpenFlowSwitch):
+
+          missing    -- in the mirror, not on the switch: installed
+          extra      -- on the switch with a cookie the controller does not
+                        know (neither in the mirror nor reserved in
+                        Routing.cookieAllocator): removed
+          mismatched -- same match and priority, other cookie or actions:
+                        reinstalled
+
+        entries with timeouts expire on their own and are ignored. a
+        switch is skipped while it has unconfirmed flow-mods, and is
+        corrected at most once per period with at most maxFlowMods
+        flow-mods, the rest is left to the next stats.
+    """
+
+    _wantComponents = set(['stats'])
+
+    def __init__(self, period=RECONCILE_PERIOD, maxFlowMods=MAX_FLOW_MODS):
+        core.listenToDependencies(self, self._wantComponents)
+        self.period = period
+        self.maxFlowMods = maxFlowMods
+
+        # { dpid: time of the last correction, ...}
+        self._corrected = {}
+
+        self.missing = 0
+        self.extra = 0
+        self.mismatched = 0
+
+#_____________________________________________________________________________#
+
+    def _handle_FlowStatsEv(self, event):
+        dpid = event.dpid
+        if not event.ofpStats and event.stats:
+            return # stats without ofp_flow_stats, nothing to compare
+        if time.time() - self._corrected.get(dpid, 0) < self.period:
+            return
+        if core.flowBatcher.isPending(dpid):
+            return # flow-mods in flight, the reply may predate them
+        if core.hasComponent('routeSnapshot') and core.routeSnapshot.isRestoring():
+            return
+
+        ofs = core.topology.getOFS(dpid)
+        if ofs is None:
+            return
+
+        try:
+            self.reconcile(ofs, event.ofpStats)
+        except Exception as inst:
+            log.exception(inst)
+
+
+    def reconcile(self, ofs, ofpStats):
+        """compare the flows reported by a switch to its mirror and send
+            the corrective flow-mods.
+            return (missing, extra, mismatched) entries.
+        """
+        expected = self._expected(ofs)
+        known = set(entry.cookie for entry in expected.itervalues())
+
+        # { (match, priority): ofp_flow_stats, ...}
+        reported = {}
+        for stat in ofpStats:
+            reported[(stat.match.pack(), stat.priority)] = stat
+
+        missing = []
+        mismatched = []
+        for key, entry in expected.iteritems():
+            stat = reported.get(key)
+            if stat is None:
+                missing.append(entry)
+            elif stat.cookie != entry.cookie or stat.actions != entry.actions:
+                mismatched.append(entry)
+
+        extra = []
+        for key, stat in reported.iteritems():
+            if key in expected or not stat.cookie:
+                continue
+            if stat.cookie in known or stat.cookie in core.routing.cookieAllocator:
+                continue
+            if stat.hard_timeout or stat.idle_timeout:
+                continue
+            extra.append(TableEntry(priority=stat.priority, cookie=stat.cookie, match=stat.match))
+
+        if not (missing or extra or mismatched):
+            return missing, extra, mismatched
+
+        log.warn("switch %s: %d missing, %d extra, %d mismatched flows"
+                 % (ofs.dpid, len(missing), len(extra), len(mismatched)))
+        self.missing += len(missing)
+        self.extra += len(extra)
+        self.mismatched += len(mismatched)
+        self._corrected[ofs.dpid] = time.time()
+
+        budget = self.maxFlowMods
+        core.flowBatcher.begin()
+        if extra[:budget]:
+            core.flowBatcher.removeStrict(ofs, extra[:budget])
+        budget -= len(extra[:budget])
+        install = (missing + mismatched)[:max(budget, 0)]
+        if install:
+            core.flowBatcher.install(ofs, install)
+        core.flowBatcher.commit()
+
+        return missing, extra, mismatched
+
+
+    def _expected(self, ofs):
+        """permanent entries of the mirror with a cookie.
+            return { (match, priority): TableEntry, ...}
+        """
+        expected = {}
+        for entry in ofs.flow_table.flow_table.entries:
+            if not entry.cookie:
+                continue
+            if entry.hard_timeout or entry.idle_timeout:
+                continue
+            expected[(entry.match.pack(), entry.priority)] = entry
+        return expected
+
+
+    def getCounters(self):
+        return {'missing': self.missing,
+                'extra': self.extra,
+                'mismatched': self.mismatched}
+
+
+###############################################################################
+
+def launch(**kwargs):
+    if core.hasComponent(NAME):
+        return None
+
+    period = kwargs.get('RECONCILE_PERIOD', RECONCILE_PERIOD)
+    maxFlowMods = kwargs.get('MAX_FLOW_MODS', MAX_FLOW_MODS)
+    comp = FlowReconciler(period, maxFlowMods)
+    core.register(NAME, comp)
+
+    # attach handlers to listners
+    core.stats.addListenerByName("FlowStatsEv", comp._handle_FlowStatsEv)
+
+    return comp
@@ -16,6 +16,7 @@ import pox.openflow.libopenflow_01 as of
 
 from middleware.utils.redisFeature import RedisFeature
 from scn.routing import MacPath, IpPath
+from scn.cookieAllocator import cookieToJson
 
 log = core.getLogger()
 
@@ -207,7 +208,7 @@ class JsonLogger(RedisFeature):
                     continue    #Control Path
 
                 kv = {}
-                kv['path_id'] = route.cookie
+                kv['path_id'] = cookieToJson(route.cookie)
                 kv['srcService_key'] = "dummy"
                 kv['srcService_name'] = "dummy"
                 kv['dstService_key'] = "dummy"
@@ -289,7 +290,7 @@ class JsonLogger(RedisFeature):
 
         for route in core.routing.getRoutes2():
             kv = {}
-            kv['path_id'] = route.cookie
+            kv['path_id'] = cookieToJson(route.cookie)
             kv['srcService_key'] = "dummy"
             kv['srcService_name'] = "dummy"
             kv['dstService_key'] = "dummy"
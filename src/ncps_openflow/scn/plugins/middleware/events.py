@@ -298,6 +298,50 @@ class CreateBiPathResp(CmdResp):
         })
 
 
+class CreateBiPathBatchReq(CmdReq):
+    """ CreateBiPathBatch Command Requset
+        paths is list of CreateBiPathReq like dict.
+          [{"src": .., "dst": .., "app_id": ..,
+            "send_conditions": .., "recv_conditions": ..}, ...]
+    """
+    NAME = 'CREATE_BI_PATH_BATCH_REQUEST'
+    cls_dict = {'listen_peer': Peer}
+
+    def __init__(self, req_id, buf, paths, listen_peer, *args, **kwargs):
+        CmdReq.__init__(self, req_id, buf, *args, **kwargs)
+        self.paths = paths or []
+        assert isinstance(listen_peer, Peer)
+        self.listen_peer = listen_peer
+
+    def _data_str(self):
+        return (CmdReq._data_str(self) +
+               ",paths=%s,listen_peer=%s" % (self.paths, self.listen_peer))
+
+
+class CreateBiPathBatchResp(CmdResp):
+    """ CreateBiPathBatch Command Response
+        path_ids is in order of request paths (None if not created),
+        error_info has the error of each path.
+    """
+    NAME = 'CREATE_BI_PATH_BATCH_RESPONSE'
+
+    def __init__(self, req_id, path_ids, dst_peer, *args, **kwargs):
+        CmdResp.__init__(self, req_id, dst_peer, *args, **kwargs)
+        self.path_ids = path_ids
+
+    def _data_str(self):
+        return "%s,path_ids=%s," % (CmdResp._data_str(self), self.path_ids)
+
+    def to_json(self):
+        return json.dumps({
+            "error"        : self.error,
+            "error_info"   : self.error_info,
+            "req_id"       : self.req_id,
+            "path_ids"     : self.path_ids,
+            "NAME"         : self.NAME
+        })
+
+
 class UpdatePathReq(CmdReq):
     """ UpdatePath Command Requset
     """
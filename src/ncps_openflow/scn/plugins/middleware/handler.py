@@ -11,7 +11,7 @@ from pox.lib.revent import EventMixin
 
 from events import (CmdReq, CmdResp,
         InitializeReq, InitializeResp, CreateBiPathReq, CreateBiPathResp,
-        DeleteBiPathReq, DeleteBiPathResp, UpdatePathReq, UpdatePathResp,
+        CreateBiPathBatchReq, CreateBiPathBatchResp, DeleteBiPathReq, DeleteBiPathResp, UpdatePathReq, UpdatePathResp,
         OptimizeReq, OptimizeResp, PushReq, HeartBeatReq, DumpReq, DumpResp)
 from path import Path, ConditionDescription, PathDescription, PathList
 from routeCreator import DijkstraRouteCreator, RoundRobinCreator
@@ -83,6 +83,8 @@ class Handler(EventMixin, RedisFeature):
         InitializeResp,
         CreateBiPathReq,
         CreateBiPathResp,
+        CreateBiPathBatchReq,
+        CreateBiPathBatchResp,
         DeleteBiPathReq,
         DeleteBiPathResp,
         UpdatePathReq,
@@ -170,12 +172,15 @@ class Handler(EventMixin, RedisFeature):
         dstIp = IPAddr(str(req.dst.get('ipaddr')))
         tos   = req.app_id.get('tos')
         minBw = req.send_conditions.get('bandwidth')
+        logic = self.__getLogic__(req.send_conditions)
         #recv_conditions is scalability for future.
 
         node = self.__getNode__(req.listen_peer)
-        path_id = self.__doInnerCreatePath__(srcIp, dstIp, tos, node, minBw)
+        path_id = self.__doInnerCreatePath__(srcIp, dstIp, tos, node, minBw, logic)
         if not path_id:
             error = 'ERR_CANNOT_GET_PATHID'
+            if minBw and core.routing.noFeasiblePath:
+                error = 'ERR_NO_FEASIBLE_PATH'
 
         req.listen_peer.protocol = Peer.TCP
         return CreateBiPathResp(
@@ -185,6 +190,55 @@ class Handler(EventMixin, RedisFeature):
                 dst_peer = req.listen_peer
             )
 
+    @raise_event
+    def _handle_CreateBiPathBatchReq(self, req, src_gw):
+        """request handler for CreateBiPathBatchReq Cmd
+            all paths are searched in order, each one charged on the graph
+            before the next one, and flow-mods are sent in one batch.
+        """
+        log.info("CreateBiPathBatchReq = [%s] NODE = [%s]" % (req, src_gw))
+        node = self.__getNode__(req.listen_peer)
+
+        requests = []
+        infos = []
+        for path in req.paths:
+            srcIp = IPAddr(str(path['src'].get('ipaddr')))
+            dstIp = IPAddr(str(path['dst'].get('ipaddr')))
+            tos   = path['app_id'].get('tos')
+            send_conditions = path.get('send_conditions') or {}
+            minBw = send_conditions.get('bandwidth')
+            logic = self.__getLogic__(send_conditions)
+
+            kwargs = self.__getCreateKwargs__(srcIp, dstIp, tos, minBw, logic)
+            requests.append((srcIp, dstIp, kwargs))
+            infos.append((srcIp, dstIp, tos, minBw))
+
+        path_ids = []
+        errors = []
+        results = core.routing.createBiRoutes(requests)
+        for (srcIp, dstIp, tos, minBw), (routeA, routeB, reason) in zip(infos, results):
+            path_id = self.__registerPath__(routeA, routeB, srcIp, dstIp, tos, node)
+            error = None
+            if not path_id:
+                error = 'ERR_CANNOT_GET_PATHID'
+                if minBw and reason == routing.NO_FEASIBLE_PATH:
+                    error = 'ERR_NO_FEASIBLE_PATH'
+            path_ids.append(path_id)
+            errors.append(error)
+
+        error = None
+        if any(errors):
+            error = 'ERR_CANNOT_GET_PATHID'
+
+        req.listen_peer.protocol = Peer.TCP
+        return CreateBiPathBatchResp(
+                req.req_id,
+                path_ids,
+                error = error,
+                error_info = errors if error else None,
+                dst_peer = req.listen_peer
+            )
+
     @raise_event
     def _handle_UpdatePathReq(self, req, src_gw):
         """request handler for UpdatePathReqReq Cmd
@@ -199,7 +253,10 @@ class Handler(EventMixin, RedisFeature):
             send, recv = self.__getPaths__(srcIp, dstIp, flag)
             log.debug('update path %s <=> %s' % (str(send), str(recv)))
             route = core.routing.getRoute(send)
-            route.conditions = self.__getConditions__(minBw)
+            logic = self.__getLogic__(req.conditions)
+            if not logic and route.conditions:
+                logic = route.conditions.get(routing.RoutingConditions.logic)
+            route.conditions = self.__getConditions__(minBw, logic)
 
         except KeyError:
             error = 'ERR_INVALID_PATHID'
@@ -350,28 +407,46 @@ class Handler(EventMixin, RedisFeature):
 #                             Other methods                                  #
 #----------------------------------------------------------------------------#
     @classmethod
-    def __getConditions__(cls, minBw):
+    def __getConditions__(cls, minBw, logic = None):
         conditions = {}
         conditions[routing.RoutingConditions.bandwidth] = minBw
+        if logic:
+            conditions[routing.RoutingConditions.logic] = logic
         # TODO
         # conditions[Conditions.fix] = ???
         return conditions
 
+    @classmethod
+    def __getLogic__(cls, conditions):
+        """get Strategy.logic of request conditions. (None -> default)
+        """
+        strategy = conditions.get('strategy')
+        if not isinstance(strategy, dict):
+            return None
+        return strategy.get('logic')
+
     def __getPaths__(self, srcIp, dstIp, flag):
         return routing.Path.create(srcIp, dstIp, tos=flag), \
                 routing.Path.create(dstIp, srcIp, tos=flag)
 
-    def __doInnerCreatePath__(self, srcIp, dstIp, tos, peer, minBw):
+    def __getCreateKwargs__(self, srcIp, dstIp, tos, minBw, logic = None):
         kwargs = {}
         kwargs['srcip'] = srcIp
         kwargs['dstip'] = dstIp
         kwargs[routing.IPPROTOCOL] = ipv4.TCP_PROTOCOL
         kwargs['tos'] = tos
-        kwargs[routing.RoutingConditions.MainKey] = self.__getConditions__(minBw)
+        kwargs[routing.RoutingConditions.MainKey] = self.__getConditions__(minBw, logic)
+        return kwargs
+
+    def __doInnerCreatePath__(self, srcIp, dstIp, tos, peer, minBw, logic = None):
+        kwargs = self.__getCreateKwargs__(srcIp, dstIp, tos, minBw, logic)
 
         log.debug(str(kwargs))
 
         routeA, routeB = core.routing.createBiRoute(srcIp, dstIp, **kwargs)
+        return self.__registerPath__(routeA, routeB, srcIp, dstIp, tos, peer)
+
+    def __registerPath__(self, routeA, routeB, srcIp, dstIp, tos, peer):
         if not routeA or not routeB:
             # XXX it would be better to send back an error
             # Done ?!?
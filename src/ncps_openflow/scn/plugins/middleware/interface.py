@@ -15,7 +15,7 @@ from pox.lib.revent import EventMixin
 
 from events import (CmdResp,
         InitializeReq, InitializeResp, CreateBiPathReq, CreateBiPathResp,
-        DeleteBiPathReq, DeleteBiPathResp, UpdatePathReq, UpdatePathResp,
+        CreateBiPathBatchReq, CreateBiPathBatchResp, DeleteBiPathReq, DeleteBiPathResp, UpdatePathReq, UpdatePathResp,
         OptimizeReq, OptimizeResp, PushReq, HeartBeatReq, DumpReq, DumpResp)
 from utils.widgets import Transport, Peer
 from utils.connection import MWTcpServer, MWUdpServer, MWTcpClient
@@ -58,6 +58,7 @@ class Interface(EventMixin):
         CmdResp,
         InitializeReq,
         CreateBiPathReq,
+        CreateBiPathBatchReq,
         UpdatePathReq,
         DeleteBiPathReq,
         OptimizeReq,
@@ -89,6 +90,7 @@ class Interface(EventMixin):
             # JSON CMD Name      : called Class
             InitializeReq.NAME   : InitializeReq,
             CreateBiPathReq.NAME : CreateBiPathReq,
+            CreateBiPathBatchReq.NAME : CreateBiPathBatchReq,
             UpdatePathReq.NAME   : UpdatePathReq,
             DeleteBiPathReq.NAME : DeleteBiPathReq,
             OptimizeReq.NAME     : OptimizeReq,
@@ -100,10 +102,10 @@ class Interface(EventMixin):
         """register handler for event raised middlewar.py
             request handler is for innter domain request.
         """
-        for req in [InitializeReq, CreateBiPathReq, UpdatePathReq, \
+        for req in [InitializeReq, CreateBiPathReq, CreateBiPathBatchReq, UpdatePathReq, \
                 DeleteBiPathReq, OptimizeReq, HeartBeatReq, DumpReq]:
             core.middleware.addListenerByName(req.__name__, self.handle_request)
-        for resp in [InitializeResp, CreateBiPathResp, UpdatePathResp, \
+        for resp in [InitializeResp, CreateBiPathResp, CreateBiPathBatchResp, UpdatePathResp, \
                 DeleteBiPathResp, OptimizeResp, DumpResp, PushReq, CmdResp]:
             core.middleware.addListenerByName(resp.__name__, self.handle_response)
 
@@ -15,14 +15,12 @@ from pox.core import core
 from pox.lib.revent import Event, EventMixin
 from utils.widgets import Peer
 from utils.redisFeature import RedisFeature
+from scn.cookieAllocator import cookieToJson
 
 log = core.getLogger()
 
 UNITS = ["P", "G", "M", "K"]
 
-MAX_COOKIE = 0x7fFFffFF
-__next_cookie__ = 1 # use as global
-
 
 class ReadOnly:
     """ReadOnly Feature
@@ -85,11 +83,16 @@ class Path(EventMixin):
 
     @classmethod
     def __generate_cookie__(cls):
-        global __next_cookie__
-        cookie = __next_cookie__
-        __next_cookie__ += 1
-        __next_cookie__ = (__next_cookie__) % (MAX_COOKIE + 1)
-        return cookie
+        """reserve cookie from routing's allocator.
+            routes and paths share one cookie space.
+        """
+        return core.routing.cookieAllocator.reserve()
+
+    def release_cookie(self):
+        """give back cookie to routing's allocator.
+        """
+        if self.cookie is not None:
+            core.routing.cookieAllocator.release(self.cookie)
 
     def __str__(self):
         return "%s:[id=%s][cookie=%s][path=%s][cond=%s][links=%s]" % (
@@ -125,9 +128,11 @@ class Path(EventMixin):
         src = self.path_description.src
         dst = self.path_description.dst
         app_id = self.path_description.app_id
+        core.flowBatcher.begin()
         for link in self.links:
             is_last = True if (link is self.links[-1]) else False
             link.apply_flow_entry(self.cookie, src, dst, app_id, is_last)
+        core.flowBatcher.commit()
 
         self.raiseEventNoErrors(PathChangedEv, changed = self)
 
@@ -137,8 +142,10 @@ class Path(EventMixin):
         src = self.path_description.src
         dst = self.path_description.dst
         app_id = self.path_description.app_id
+        core.flowBatcher.begin()
         for link in self.links:
             link.remove_flow_entry(self.cookie, src, dst, app_id)
+        core.flowBatcher.commit()
 
         self.raiseEventNoErrors(PathChangedEv, changed = self)
 
@@ -163,7 +170,7 @@ class Path(EventMixin):
         """
         return json.dumps({
             "id"     : self.path_id,
-            "cookie" : self.cookie,
+            "cookie" : cookieToJson(self.cookie),
             "path_description" : {
                 "src" : self.path_description.src.to_json(),
                 "dst" : self.path_description.dst.to_json(),
@@ -321,6 +328,7 @@ class PathList(dict, RedisFeature):
         self.__delete_state__(self._rediskey, save)
         self.__publish__(self._rediskey + ":REMOVE", save)
         del self[str(_key)]
+        path.release_cookie()
 
         return self
 
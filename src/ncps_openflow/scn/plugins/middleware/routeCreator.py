@@ -7,6 +7,8 @@ scn.plugins.middleware.routeCreator
 """
 
 from pox.core import core
+from scn.pathSearch import shortestPath, widestPath
+
 log = core.getLogger()
 
 class RouteCreatorIF:
@@ -137,68 +139,42 @@ class DijkstraRouteCreator(RouteCreatorIF):
           <ja> リストなどで計算せずに、ScnLinkオブジェクトのまま計算したほうがよいと思う
         """
         log.info("src=%d, dst=%d, graph=%s" % (int(src_dpid), int(dst_dpid), str(graph)))
-        distances = {} # Final distances dict
-        predecessor = {} # predecessor dict
-
-        # Fill the dicts with default values
-        for node in graph.keys():
-            distances[node] = 10**15 # Vertices are unreachable
-            predecessor[node] = "" # Vertices have no predecessors
-
-        distances[src_dpid] = 0 # The start vertex needs no move
-
-        unseen_nodes = graph.keys() # All nodes are unseen
-
-        foundDst = False
-
-        if src_dpid not in graph.keys():
+        if src_dpid not in graph:
             log.warn("no src")
             return []
 
-        while len(unseen_nodes) > 0:
-            # Select the node with the lowest value in D (final distance)
-            shortest = None
-            node = ''
-            for temp_node in unseen_nodes:
-                if shortest == None:
-                    shortest = distances[temp_node]
-                    node = temp_node
-                elif distances[temp_node] < shortest:
-                    shortest = distances[temp_node]
-                    node = temp_node
-
-            # Remove the selected node from unseen_nodes
-            unseen_nodes.remove(node)
-
-            # For each child (ie: connected vertex) of the current node
-            for child_node, child_value in graph[node].items():
-                if child_node == dst_dpid:
-                    foundDst = True
-                if distances[child_node] > distances[node] + child_value:
-                    distances[child_node] = distances[node] + child_value
-                    # To go to child_node, you have to go through node
-                    predecessor[child_node] = node
-
-        if not foundDst:
+        path = shortestPath(graph, src_dpid, dst_dpid)
+        if not path:
             log.warn("no dst")
             return []
 
-        # Set a clean path
-        path = []
-        links = []
-
-        # We begin from the end
-        node = dst_dpid
-        # While we are not arrived at the beginning
-        while not (node == src_dpid):
-            if path.count(node) == 0:
-                # Insert the predecessor of the current node
-                path.insert(0, (predecessor[node], node, graph[predecessor[node]][node]))
-                links.insert(0, core.openflow_discovery.getLinkByDpid(predecessor[node], node))
-                node = predecessor[node] # The current node becomes its predecessor
-            else:
-                break
+        links = [core.openflow_discovery.getLinkByDpid(node, next_node)
+                 for node, next_node, _ in path]
 
         log.info(map(str, links))
         return links
 
+
+class WidestRouteCreator(DijkstraRouteCreator):
+    """use widest path (maximum bottleneck residual bandwidth) logic.
+    """
+    TYPE = 'WIDEST'
+
+    @classmethod
+    def create_graph(cls, links):
+        """ create residual bandwidth map of all links.
+           {src_dpid: {dst_dpid: residual bandwidth, ...}, ...}
+        """
+        return core.routing.usedBwGraph.residualView()
+
+    @classmethod
+    def search_links(cls, src_dpid, dst_dpid, graph):
+        """search links of the widest path, fewest hops first.
+        """
+        path = widestPath(graph, src_dpid, dst_dpid)
+        if not path:
+            log.warn("no path src=%d, dst=%d" % (int(src_dpid), int(dst_dpid)))
+            return []
+
+        return [core.routing.usedBwGraph.getWidestLink(node, next_node)
+                for node, next_node, _ in path]
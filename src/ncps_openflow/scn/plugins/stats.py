@@ -213,11 +213,13 @@ class FlowStatsEv(StatsEv):
 
     EVENT_NAME = 'FlowStatsEv'
 
-    def __init__(self, dpid, stats, unit):
+    def __init__(self, dpid, stats, unit, ofpStats=None):
         StatsEv.__init__(self, dpid, stats, unit)
         global IDENT
         IDENT = IDENT + 1
         self.ident = IDENT
+        # ofp_flow_stats list of the reply (stats are their dicts)
+        self.ofpStats = ofpStats or []
 
 
 class PortStatsEv(StatsEv):
@@ -285,19 +287,19 @@ class Stats(EventMixin) :
 #______________________________________________________________________________#
 #                                   Handle                                     #
 #______________________________________________________________________________#
-    def raiseEvent(self, event, dpid, stats, unit):
+    def raiseEvent(self, event, dpid, stats, unit, *args):
         """
         @override
         """
         log.debug("%s from %s: \n%s\n", event, dpidToStr(dpid), stats)
-        EventMixin.raiseEvent(self, event, dpid, stats, unit)
+        EventMixin.raiseEvent(self, event, dpid, stats, unit, *args)
 
 
     def _handle_FlowStatsReceived(self, event):
         log.debug("handle flowstats recieved")
         stats = flow_stats_to_list(event.stats)
         dpid = event.connection.dpid
-        self.raiseEvent(FlowStatsEv, dpid, stats, self.unit)
+        self.raiseEvent(FlowStatsEv, dpid, stats, self.unit, event.stats)
 
 
     def _handle_AggregateFlowStatsReceived (self, event):
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+scn.rerouteDamper
+~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+
+from collections import deque
+import time
+
+log = core.getLogger()
+
+DWELL_TIME        = 0    # seconds a route stays on a via before it may move (0: off)
+BACKOFF_MAX_LEVEL = 5    # hold time is at most DWELL_TIME * 2**BACKOFF_MAX_LEVEL
+HYSTERESIS        = 0.05 # relative cost gain needed to move a route
+MAX_MOVES         = 0    # moves per minute, all routes (0: no cap)
+
+
+class RouteMoves:
+    """move history of one route.
+    """
+
+    def __init__(self):
+        self.lastMove = None
+        self.level = 0 # back-off level, hold time = dwell * 2**level
+        self.moves = 0
+
+
+class RerouteDamper:
+    """Damping of route moves (a route changing via while its path stays).
+        a route which moved stays on its via for its hold time, DWELL_TIME
+        doubled for each move done within twice the previous hold time
+        (exponential back-off), reset by a quiet period. a move is worth
+        it only if the new via is cheaper by the hysteresis band. moves
+        of all routes can be capped per minute.
+
+        damping is off while dwell is 0: isEnabled() is False and moves
+        are never suppressed (the hysteresis band is still used by
+        bwFlowBalancing). moves forced by a link failure are counted but
+        neither suppressed nor part of the back-off.
+    """
+
+    def __init__(self, dwell=DWELL_TIME, hysteresis=HYSTERESIS,
+                 maxLevel=BACKOFF_MAX_LEVEL, maxMoves=MAX_MOVES):
+        self.dwell = dwell
+        self.hysteresis = hysteresis
+        self.maxLevel = maxLevel
+        self.maxMoves = maxMoves
+
+        # { cookie: RouteMoves, ...}
+        self._routes = {}
+        # times of the moves of the last minute
+        self._recent = deque()
+
+        self.moves = 0
+        self.forcedMoves = 0
+        self.suppressed = 0
+
+#_____________________________________________________________________________#
+
+    def isEnabled(self):
+        return self.dwell > 0
+
+
+    def holdTime(self, cookie):
+        state = self._routes.get(cookie)
+        if state is None or state.lastMove is None:
+            return 0
+        return self.dwell * 2 ** state.level
+
+
+    def canMove(self, cookie, now=None):
+        """True if the route may move now (hold time and churn cap).
+        """
+        now = now or time.time()
+        state = self._routes.get(cookie)
+        if state is not None and state.lastMove is not None \
+                and now - state.lastMove < self.dwell * 2 ** state.level:
+            return False
+
+        if self.maxMoves:
+            self.__expire__(now)
+            if len(self._recent) >= self.maxMoves:
+                return False
+        return True
+
+
+    def isBetter(self, oldCost, newCost):
+        """True if newCost beats oldCost by more than the hysteresis band.
+        """
+        return newCost < oldCost * (1. - self.hysteresis)
+
+
+    def keep(self, cookie, oldCost, newCost):
+        """True if the route should stay on its via (move suppressed).
+        """
+        if not self.isEnabled():
+            return False
+        if self.canMove(cookie) and self.isBetter(oldCost, newCost):
+            return False
+        self.suppress(cookie, "cost %s -> %s" % (oldCost, newCost))
+        return True
+
+
+    def suppress(self, cookie, reason=None):
+        """record a move of the route which was not done.
+        """
+        self.suppressed += 1
+        log.debug("move of route %s suppressed (%shold %ss)"
+                  % (cookie, reason + ", " if reason else "", self.holdTime(cookie)))
+
+
+    def recordMove(self, cookie, forced=False, now=None):
+        """record a move of the route.
+            forced -- moved by a link failure: only counted.
+        """
+        if forced:
+            self.forcedMoves += 1
+            return
+
+        now = now or time.time()
+        state = self._routes.get(cookie)
+        if state is None:
+            state = self._routes[cookie] = RouteMoves()
+
+        if state.lastMove is not None and now - state.lastMove < 2 * self.dwell * 2 ** state.level:
+            state.level = min(state.level + 1, self.maxLevel)
+        else:
+            state.level = 0
+        state.lastMove = now
+        state.moves += 1
+
+        self.moves += 1
+        self._recent.append(now)
+        self.__expire__(now)
+
+
+    def forget(self, cookie):
+        self._routes.pop(cookie, None)
+
+
+    def stats(self):
+        self.__expire__(time.time())
+        busiest = sorted(self._routes.iteritems(), key=lambda item: item[1].moves, reverse=True)[:5]
+        return {'moves': self.moves,
+                'forcedMoves': self.forcedMoves,
+                'suppressed': self.suppressed,
+                'lastMinute': len(self._recent),
+                'backedOff': sum(1 for state in self._routes.itervalues() if state.level),
+                'busiest': [(cookie, state.moves) for cookie, state in busiest]}
+
+#_____________________________________________________________________________#
+
+    def __expire__(self, now):
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+scn.routeIndex
+~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from collections import defaultdict
+
+
+class RouteIndex:
+    """secondary indexes of Routing.routes: cookies by path, end address,
+        tos, switch and link. kept by Routing._indexRoute/_unindexRoute.
+    """
+
+    def __init__(self):
+        # { Path: set([cookie, ...]), ...} (mesh routes share a path)
+        self.byPath = defaultdict(set)
+        # { ipaddr or macaddr: set([cookie, ...]), ...} (src and dst)
+        self.byIp = defaultdict(set)
+        # { tos: set([cookie, ...]), ...}
+        self.byTos = defaultdict(set)
+        # { dpid: set([cookie, ...]), ...}
+        self.bySwitch = defaultdict(set)
+        # { ScnLink: set([cookie, ...]), ...} routes going through the link
+        self.byLink = defaultdict(set)
+
+#_____________________________________________________________________________#
+
+    def add(self, route):
+        for index, key in self._keys(route):
+            index[key].add(route.cookie)
+
+
+    def remove(self, route):
+        for index, key in self._keys(route):
+            cookies = index.get(key)
+            if cookies is None:
+                continue
+            cookies.discard(route.cookie)
+            if not cookies:
+                del index[key]
+
+
+    def _keys(self, route):
+        keys = []
+        path = route.path
+        if path is not None:
+            keys.append((self.byPath, path))
+            for addr in set([path.src, path.dst]):
+                if addr is not None:
+                    keys.append((self.byIp, addr))
+            if hasattr(path, 'tos'): # IpPath
+                keys.append((self.byTos, path.tos))
+
+        dpids = set(ofs.dpid for ofs in route.entries)
+        for link in route.links or ():
+            keys.append((self.byLink, link))
+            dpids.add(link.dpid1)
+            dpids.add(link.dpid2)
+        for dpid in dpids:
+            keys.append((self.bySwitch, dpid))
+
+        return keys
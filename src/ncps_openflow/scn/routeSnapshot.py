@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""
+scn.routeSnapshot
+~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+from pox.lib.addresses import IPAddr, EthAddr
+from pox.lib.recoco import Timer
+from pox.openflow.flow_table import TableEntry
+import pox.openflow.libopenflow_01 as of
+
+from scn.scnOFTopology import ScnLink
+from scn.routing import ScnRoute, ScnLinks, IpPath, MacPath
+
+import json
+import os
+import time
+
+log = core.getLogger()
+NAME = 'routeSnapshot'
+
+SNAPSHOT_PERIOD = 2      # seconds between two journal writes
+RESTORE_TIMEOUT = 120    # seconds to wait for the links and hosts of a snapshot
+COMPACT_RECORDS = 1000   # journal records before the file is rewritten
+
+IP  = 'ip'
+MAC = 'mac'
+
+
+def packEntry(entry):
+    return entry.to_flow_mod().pack().encode('hex')
+
+
+def unpackEntry(data):
+    msg = of.ofp_flow_mod()
+    msg.unpack(data.decode('hex'))
+    return TableEntry.from_flow_mod(msg)
+
+
+def routeToRecord(route):
+    """JSON record of a ScnRoute.
+    """
+    path = None
+    if route.path is not None:
+        kind = MAC if isinstance(route.path.dst, EthAddr) else IP
+        path = [kind, _addrToRecord(route.path.src), _addrToRecord(route.path.dst),
+                getattr(route.path, 'tos', 0)]
+
+    conditions = None
+    if route.conditions is not None:
+        conditions = [[key, value] for key, value in route.conditions.iteritems()]
+
+    last = getattr(route.lastEntity, 'port', None)
+    return {'cookie': route.cookie,
+            'path': path,
+            'conditions': conditions,
+            'links': [[l.dpid1, l.port1, l.dpid2, l.port2] for l in route.links or []],
+            'entries': [[ofs.dpid, packEntry(entry)] for ofs, entry in route.entries.iteritems()],
+            'last': last}
+
+
+def _addrToRecord(addr):
+    """address as a string, None (src of mesh routes) as null.
+    """
+    if addr is None:
+        return None
+    return str(addr)
+
+
+def _addrFromRecord(value, kind=IP):
+    """address of a record, IPAddr and EthAddr want str, not unicode.
+    """
+    if value is None:
+        return None
+    if kind == MAC:
+        return EthAddr(str(value))
+    return IPAddr(str(value))
+
+
+def _peerToRecord(peer):
+    if peer is None:
+        return None
+    return {'scn_id': getattr(peer, 'scn_id', None),
+            'ipaddr': str(peer.ipaddr),
+            'port': peer.port,
+            'protocol': peer.protocol,
+            'domain': peer.domain}
+
+
+def _peerFromRecord(info):
+    if info is None:
+        return None
+    from scn.plugins.middleware.utils.widgets import Peer, ScnClientNode
+    if info.get('scn_id') is None:
+        return Peer.from_dict(info)
+    return ScnClientNode(info['scn_id'], info['ipaddr'], info['port'],
+                         info.get('protocol'), info.get('domain'))
+
+
+class RouteSnapshot:
+    """On-disk snapshot of the routing state, for warm restart.
+        the file is a journal of JSON records, one per line, a record
+        overrides the previous records of the same key:
+
+          {"route": cookie, "data": route record or null}
+          {"flows": dpid, "data": [flow_mod (hex), ...]}
+          {"state": {"pair": ..., "mesh": ..., "pathInfo": ...}}
+
+        changes are appended every SNAPSHOT_PERIOD, the file is rewritten
+        with the whole state after COMPACT_RECORDS records.
+
+        on load, the cookies of the snapshot are claimed and the flows
+        of each switch seed its flow table mirror when it connects, so
+        flowBatcher adopts them instead of reinstalling. routes are rebuilt
+        when their links are discovered again, mesh routes when their
+        host is known. what is not restored within RESTORE_TIMEOUT is
+        dropped and its flows removed.
+    """
+
+    def __init__(self, fileName, period=SNAPSHOT_PERIOD, timeout=RESTORE_TIMEOUT):
+        self.fileName = fileName
+        self.timeout = timeout
+        self._records = 0
+
+        # dirty keys, written by the next flush
+        self._routes = set()
+        self._flows = set()
+        self._state = False
+
+        # snapshot entries not restored yet
+        # { cookie: route record, ...}
+        self.pendingRoutes = {}
+        # { dpid: [flow_mod (hex), ...], ...}
+        self.pendingFlows = {}
+        # { dst: [prefix, { dpid: cookie, ...}], ...}
+        self.pendingMesh = {}
+        # { cookie: cookie, ...}
+        self.pendingPairs = {}
+        # { path_id: [src, dst, tos, peer record], ...}
+        self.pendingPathInfo = {}
+        self._deadline = None
+
+        self.load()
+        self._timer = Timer(period, self._tick, recurring=True)
+        core.addListenerByName("GoingDownEvent", self._handle_GoingDownEvent)
+
+#_____________________________________________________________________________#
+
+    def routeChanged(self, cookie):
+        self._routes.add(cookie)
+        self._state = True
+
+
+    def flowsChanged(self, dpid):
+        self._flows.add(dpid)
+
+
+    def popSwitchFlows(self, dpid):
+        """TableEntry list of the snapshot for a connecting switch.
+        """
+        flows = self.pendingFlows.pop(dpid, None) or []
+        if flows:
+            self._flows.add(dpid)
+        return [unpackEntry(data) for data in flows]
+
+
+    def isRestoring(self):
+        return bool(self.pendingRoutes or self.pendingMesh
+                    or self.pendingPairs or self.pendingPathInfo)
+
+#_____________________________________________________________________________#
+
+    def load(self):
+        routes, flows, state = self._read()
+        routing = core.routing
+
+        for cookie, record in routes.iteritems():
+            if record is None:
+                continue
+            if not routing.cookieAllocator.claim(cookie):
+                log.warn("snapshot cookie %s already in use, route dropped" % cookie)
+                continue
+            self.pendingRoutes[cookie] = record
+        self.pendingFlows = flows
+
+        self.pendingPairs = dict((a, b) for a, b in state.get('pair', []))
+        self.pendingMesh = dict((dst, [prefix, dict((dpid, cookie) for dpid, cookie in mesh)])
+                                for dst, prefix, mesh in state.get('mesh', []))
+        self.pendingPathInfo = dict((info[0], info[1:]) for info in state.get('pathInfo', []))
+
+        if self.isRestoring():
+            self._deadline = time.time() + self.timeout
+            log.info("snapshot %s: %d routes, %d switchs, %d meshes to restore"
+                     % (self.fileName, len(self.pendingRoutes), len(self.pendingFlows), len(self.pendingMesh)))
+        self._compact()
+
+
+    def _read(self):
+        routes = {}
+        flows = {}
+        state = {}
+        if not os.path.exists(self.fileName):
+            return routes, flows, state
+
+        with open(self.fileName) as f:
+            for num, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write of the last record
+                    log.warn("%s:%d: bad snapshot record ignored" % (self.fileName, num + 1))
+                    continue
+                if 'route' in record:
+                    routes[record['route']] = record['data']
+                elif 'flows' in record:
+                    flows[record['flows']] = record['data']
+                elif 'state' in record:
+                    state = record['state']
+        return routes, flows, state
+
+#_____________________________________________________________________________#
+
+    def flush(self):
+        if not (self._routes or self._flows or self._state):
+            return
+        if self._records >= COMPACT_RECORDS:
+            self._compact()
+            return
+
+        records = [self._routeRecord(cookie) for cookie in self._routes]
+        records.extend(self._flowsRecord(dpid) for dpid in self._flows)
+        if self._state:
+            records.append(self._stateRecord())
+        self._clearDirty()
+
+        with open(self.fileName, 'a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._records += len(records)
+
+
+    def _compact(self):
+        routing = core.routing
+        records = [self._routeRecord(cookie) for cookie in routing.routes]
+        records.extend({'route': cookie, 'data': record}
+                       for cookie, record in self.pendingRoutes.iteritems())
+        dpids = set(self.pendingFlows)
+        dpids.update(ofs.dpid for ofs in core.topology.getSwitchs())
+        records.extend(self._flowsRecord(dpid) for dpid in dpids)
+        records.append(self._stateRecord())
+        self._clearDirty()
+
+        tmpName = self.fileName + '.tmp'
+        with open(tmpName, 'w') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmpName, self.fileName)
+        self._records = len(records)
+
+
+    def _clearDirty(self):
+        self._routes = set()
+        self._flows = set()
+        self._state = False
+
+
+    def _routeRecord(self, cookie):
+        route = core.routing.routes.get(cookie)
+        if route is None:
+            return {'route': cookie, 'data': self.pendingRoutes.get(cookie)}
+        return {'route': cookie, 'data': routeToRecord(route)}
+
+
+    def _flowsRecord(self, dpid):
+        ofs = core.topology.getOFS(dpid)
+        if ofs is None or dpid in self.pendingFlows:
+            return {'flows': dpid, 'data': self.pendingFlows.get(dpid, [])}
+        return {'flows': dpid, 'data': [packEntry(entry) for entry in ofs.flow_table.flow_table.entries]}
+
+
+    def _stateRecord(self):
+        routing = core.routing
+        pairs = dict(self.pendingPairs)
+        pairs.update(routing.route_pair)
+
+        mesh = dict((str(dst), [prefix, routes.items()])
+                    for dst, (prefix, routes) in self.pendingMesh.iteritems())
+        for dst, routes in routing.mesh.iteritems():
+            tree = routing.meshMaintainer.trees.get(dst)
+            prefix = tree.prefix if tree is not None else None
+            mesh[str(dst)] = [prefix, routes.items()]
+
+        pathInfo = dict(self.pendingPathInfo)
+        if core.hasComponent('middleware'):
+            for key, (src, dst, tos, peer) in core.middleware._path_info.iteritems():
+                pathInfo[key] = [_addrToRecord(src), _addrToRecord(dst), tos, _peerToRecord(peer)]
+
+        return {'state': {'pair': pairs.items(),
+                          'mesh': [[dst, prefix, routes] for dst, (prefix, routes) in mesh.iteritems()],
+                          'pathInfo': [[key] + info for key, info in pathInfo.iteritems()]}}
+
+#_____________________________________________________________________________#
+
+    def restore(self):
+        """rebuild the snapshot entries whose switchs, links and hosts are known.
+        """
+        routing = core.routing
+        restored = 0
+        for cookie, record in self.pendingRoutes.items():
+            route = self._buildRoute(record)
+            if route is None:
+                continue
+            del self.pendingRoutes[cookie]
+            routing.restoreRoute(route)
+            restored += 1
+
+        for a, b in self.pendingPairs.items():
+            if a in routing.routes and b in routing.routes:
+                routing.route_pair[a] = b
+                del self.pendingPairs[a]
+
+        # prefix meshes first, host trees are covered by them
+        for dst, (prefix, routes) in sorted(self.pendingMesh.items(), key=lambda item: item[1][0] is None):
+            if any(cookie in self.pendingRoutes for cookie in routes.itervalues()):
+                continue
+            if self._restoreMesh(_addrFromRecord(dst), prefix, routes):
+                del self.pendingMesh[dst]
+
+        if self.pendingPathInfo and core.hasComponent('middleware'):
+            for key, (src, dst, tos, peer) in self.pendingPathInfo.iteritems():
+                core.middleware._path_info[key] = [_addrFromRecord(src), _addrFromRecord(dst),
+                                                   tos, _peerFromRecord(peer)]
+            self.pendingPathInfo = {}
+            self._state = True
+
+        if restored:
+            log.info("%d routes restored from snapshot" % restored)
+            self._state = True
+
+
+    def drop(self):
+        """forget the snapshot entries that were not restored.
+        """
+        routing = core.routing
+        log.warn("snapshot: %d routes, %d meshes not restored, dropped"
+                 % (len(self.pendingRoutes), len(self.pendingMesh)))
+
+        for dst, (prefix, routes) in self.pendingMesh.iteritems():
+            for cookie in routes.itervalues():
+                route = routing.getRoute(cookie)
+                if route is not None:
+                    routing.delRoute(route)
+
+        core.flowBatcher.begin()
+        for cookie, record in self.pendingRoutes.iteritems():
+            for dpid, data in record['entries']:
+                ofs = core.topology.getOFS(dpid)
+                if ofs is not None:
+                    core.flowBatcher.removeStrict(ofs, unpackEntry(data))
+            routing.releaseCookie(cookie)
+            self._routes.add(cookie)
+        core.flowBatcher.commit()
+
+        self.pendingRoutes = {}
+        self.pendingMesh = {}
+        self.pendingPairs = {}
+        self._state = True
+
+
+    def _buildRoute(self, record):
+        links = []
+        for dpid1, port1, dpid2, port2 in record['links']:
+            ofp1 = core.topology.getOFP(dpid1, port1)
+            ofp2 = core.topology.getOFP(dpid2, port2)
+            if ofp1 is None or ofp2 is None:
+                return None
+            if dpid1 == dpid2:
+                link = ScnLink(ofp1, ofp2) # local via
+            else:
+                link = core.openflow_discovery.getLink(ofp1, ofp2)
+                if link is None:
+                    return None
+            links.append(link)
+
+        entries = {}
+        for dpid, data in record['entries']:
+            ofs = core.topology.getOFS(dpid)
+            if ofs is None:
+                return None
+            entries[ofs] = unpackEntry(data)
+
+        route = ScnRoute()
+        route.cookie = record['cookie']
+        route.links = ScnLinks(links)
+        route.entries = entries
+        if record['path'] is not None:
+            kind, src, dst, tos = record['path']
+            src = _addrFromRecord(src, kind)
+            dst = _addrFromRecord(dst, kind)
+            if kind == MAC:
+                route.path = MacPath(src, dst)
+            else:
+                route.path = IpPath(src, dst, tos)
+        if record['conditions'] is not None:
+            route.conditions = dict((key, value) for key, value in record['conditions'])
+        if record['last'] is not None:
+            route.lastEntity = of.ofp_action_output(port=record['last'], max_len=0)
+        if links:
+            route.firstEntity = links[0].ofs1
+        return route
+
+
+    def _restoreMesh(self, dst, prefix, routes):
+        routing = core.routing
+        if prefix is not None:
+            # the prefix tree is rebuilt with its first member host
+            routing.mesh[dst] = routes
+            return True
+
+        if core.topology.getHost(dst) is None:
+            return False
+
+        if dst in routing.meshMaintainer.trees:
+            # rebuilt meanwhile, forget the routes of the snapshot
+            current = set(routing.mesh.get(dst, {}).itervalues())
+            for cookie in routes.itervalues():
+                route = routing.getRoute(cookie)
+                if route is not None and cookie not in current:
+                    routing.delRoute(route, remove=False)
+            return True
+
+        routing.mesh[dst] = routes
+        routing._createMesh(dst, routing.getUsedBwGraph(routing.forceRoute))
+        return True
+
+#_____________________________________________________________________________#
+
+    def _tick(self):
+        try:
+            if self.isRestoring():
+                self.restore()
+                if self.isRestoring() and time.time() > self._deadline:
+                    self.drop()
+            self.flush()
+        except Exception as inst:
+            log.exception(inst)
+
+
+    def _handle_GoingDownEvent(self, event):
+        self._timer.cancel()
+        self.flush()
+
+
+def launch(fileName):
+    if core.hasComponent(NAME):
+        return None
+
+    comp = RouteSnapshot(fileName)
+    core.register(NAME, comp)
+    return comp
@@ -21,6 +21,17 @@ from scn.scnOFTopology import ScnOpenFlowHost
 from scn.scnOFTopology import ScnOpenFlowPort
 from scn.scnOFTopology import ScnOpenFlowSwitch
 from scn.scnOFTopology import ScnLink
+from scn.pathSearch import shortestPath
+from scn.usedBwGraph import UsedBwGraph
+from scn.pathCache import PathCache
+from scn.routeIndex import RouteIndex
+from scn.routingConfig import RoutingConfig, K_PATHS
+from scn.viaSearch import ViaSearch
+from scn.viaSearch import LOGIC_SHORTEST, ECMP_HASH, ECMP_LEAST_LOAD
+from scn.cookieAllocator import CookieAllocator, COOKIE_WIDTH
+from scn.meshMaintainer import MeshMaintainer, MESH_PREFIX
+from scn.backupMaintainer import BackupMaintainer
+from scn.rerouteDamper import RerouteDamper, DWELL_TIME, HYSTERESIS, MAX_MOVES
 
 import datetime
 from math import ceil
@@ -45,6 +56,11 @@ IPPROTOCOL   = 'ipProtocol'
 TOS          = 'tos'
 IDLE_TIMEOUT = 'idle_timeout'
 HARD_TIMEOUT = 'hard_timeout'
+SYMMETRIC    = 'symmetric'
+
+# reasons of createBiRoutes for a route not created
+NO_FEASIBLE_PATH = 'noFeasiblePath' # no via with the requested bandwidth
+NOT_CREATED      = 'notCreated'
 FORCE_ROUTE  = False
 
 
@@ -120,19 +136,20 @@ class RoutingConditions:
     MainKey   = 'conditions'
     bandwidth = 0x01 # integer
     fix       = 0x02 # boolean
+    logic     = 0x03 # LOGIC_SHORTEST, LOGIC_WIDEST or LOGIC_LATENCY (scn.viaSearch)
 
 
 class ScnLinks:
 
     # should know its bandwidth
-    def __init__(self, links=[]):
+    def __init__(self, links=None):
 
         # [ ScnLink, ...]
-        self.links = links
+        self.links = links if links is not None else []
 
 
     def append(self, link):
-        assert isinstance(link, Link)
+        assert isinstance(link, ScnLink)
         self.links.append(link)
 
 
@@ -257,12 +274,30 @@ class ScnLinks:
             yield link
 
 
-class Hops:
+class Hops(object):
 
-    def __init__(self, ofs1, ofs2):
+    def __init__(self, ofs1, ofs2, routing=None):
         self.ofs1 = ofs1
         self.ofs2 = ofs2
-        self.ways = [] # [ ScnLinks, ...]
+        self.routing = routing
+        self._ways = None # [ ScnLinks, ...], computed on first access
+
+
+    @property
+    def ways(self):
+        if self._ways is None:
+            routing = self.routing or core.routing
+            self._ways = routing.getRoutes(self.ofs1, self.ofs2) or []
+        return self._ways
+
+
+    @ways.setter
+    def ways(self, ways):
+        self._ways = ways
+
+
+    def invalidate(self):
+        self._ways = None
 
 
     def __eq__(self, other):
@@ -274,7 +309,7 @@ class Hops:
 
 
     def __hash__(self):
-        return hash(self.ofs1.dpid, self.ofs2.dpid)
+        return hash((self.ofs1.dpid, self.ofs2.dpid))
 
 
     def getVia(self, condition=None):
@@ -292,11 +327,9 @@ class Hops:
 class ScnRoute:
 
     def __init__(self):
-        # XXX Problem :
-        #     javascript's JSON.parse can NOT parse large integers
-        #     well...it can but it will be trucated i.e. false
-        # TODO
-        # Check if cookie already exists...if it exists, get a new random number
+        # reserved by Routing.cookieAllocator.
+        # javascript's JSON.parse truncates large integers,
+        # use cookieAllocator.cookieToJson to send it to JSON consumers.
         self.cookie = -1
         self.path = None
 
@@ -322,6 +355,12 @@ class ScnRoute:
         return s
 
 
+    def getReservedBandwidth(self):
+        if not self.conditions:
+            return 0
+        return self.conditions.get(RoutingConditions.bandwidth) or 0
+
+
     def isSameLinks(self, newVia):
         if len(newVia) != len(self.links):
             return False
@@ -356,7 +395,9 @@ class Routing(EventMixin):
         RouteDeletedEv,
     ]
 
-    def __init__(self, forceRoute=False):
+    def __init__(self, config=None):
+        # options, scn.routingConfig.RoutingConfig
+        self.config = config or RoutingConfig()
 
         # { cookie: ScnRoute, ...}
         self.routes = {}
@@ -364,112 +405,225 @@ class Routing(EventMixin):
         self.route_pair = {}
         # { ipaddr: { dpid: cookie, ...}, ...}
         self.mesh = {}
+        self.meshMaintainer = MeshMaintainer(self, self.config.meshAggregate, self.config.meshPrefix)
+
+        # secondary indexes of self.routes, kept by _indexRoute/_unindexRoute
+        self.routeIndex = RouteIndex()
 
         # {(dpid1, dpid2): hops, ...}
         self.hops = {}
-        self.forceRoute = forceRoute
+        self.kPaths = self.config.kPaths
+        self.forceRoute = self.config.forceRoute
+        # reverse routes of createBiRoute go through the reverse links
+        self.symmetric = self.config.symmetric
+
+        # weighted graph for path computation, updated by events
+        self.usedBwGraph = UsedBwGraph(self, self.forceRoute)
+        self.usedBwGraph.rebuild()
+        # getVia results, valid until the epoch of usedBwGraph changes
+        self.pathCache = PathCache(self.usedBwGraph)
+        # shortest, constrained, widest, latency and ECMP via searches
+        self.viaSearch = ViaSearch(self, self.config.ecmp, self.config.allPairs)
+        # dwell time, back-off and hysteresis of route moves
+        self.damper = RerouteDamper(self.config.dwell, self.config.hysteresis,
+                                    maxMoves=self.config.maxMoves)
 
         core.openflow_discovery.addListenerByName("LinkEvent", self._handle_LinkEvent)
 
-        self.maxCookie = 2**16-1
-        self.previousCookie = 0
+        # shared with middleware (scn.plugins.middleware.path.Path)
+        self.cookieAllocator = CookieAllocator(self.config.cookieWidth)
         self.optimizeRequested = False
 
+        # backup vias of reserved routes (None: rerouted by path search)
+        self.backupMaintainer = None
+        if self.config.backupPaths:
+            self.backupMaintainer = BackupMaintainer(self)
 
-    def reserveCookie(self):
-        cookies = self.routes.keys()
-        for i in xrange(self.previousCookie + 1, self.previousCookie + self.maxCookie):
-            newCookie = i % (self.maxCookie + 1)
-            if not newCookie:
-                continue
+        # { _resolveInfo arguments: info, ...} during createBiRoutes
+        self._resolved = None
 
-            if newCookie not in cookies:
-                self.routes[newCookie] = None
-                self.previousCookie = newCookie
-                return newCookie
 
+    @property
+    def noFeasiblePath(self):
+        """set by getVia when a constrained search found no via.
+        """
+        return self.viaSearch.noFeasiblePath
 
-    def releaseCookie(self, cookie):
-        try:
-            del self.routes[cookie]
-        except Exception as inst:
-            log.exception(inst)
+    @noFeasiblePath.setter
+    def noFeasiblePath(self, value):
+        self.viaSearch.noFeasiblePath = value
 
 
-    def checkHops(self, ofs1, ofs2):
-        t1 = datetime.datetime.now()
-        log.debug("checkHops started (%s-%s)" % (ofs1.dpid, ofs2.dpid))
+    def reserveCookie(self):
+        return self.cookieAllocator.reserve()
 
-        dpidSrc=ofs1.dpid
-        dpidDst=ofs2.dpid
-        switchs = list(core.topology.getSwitchs())
-        count =0
 
-        for i in xrange(0, len(switchs)):
-            ofs1 = switchs[i]
-            for j in xrange(i+1, len(switchs)):
-                ofs2 = switchs[j]
-                key1 = (ofs1.dpid, ofs2.dpid)
-                key2 = (ofs2.dpid, ofs1.dpid)
+    def releaseCookie(self, cookie):
+        self.cookieAllocator.release(cookie)
 
-                try:
-                    hops1 = self.hops[key1]
-                except KeyError:
-                    hops1 = Hops(ofs1, ofs2)
-                    self.hops[key1] = hops1
 
-                try:
-                    hops2 = self.hops[key2]
-                except KeyError:
-                    hops2 = Hops(ofs2, ofs1)
-                    self.hops[key1] = hops2
+    def getHops(self, ofs1, ofs2):
+        """get Hops between two switchs, its ways are computed on demand.
+        """
+        key = (ofs1.dpid, ofs2.dpid)
+        hops = self.hops.get(key)
+        if hops is None:
+            hops = Hops(ofs1, ofs2, self)
+            self.hops[key] = hops
+        return hops
 
-                hops1.ways = self.getRoutes(ofs1.dpid, ofs2.dpid)
-                self.hops[key1] = hops1
 
-                hops2.ways = self.getRoutes(ofs2.dpid, ofs1.dpid)
-                self.hops[key2] = hops2
+    def checkHops(self, ofs1=None, ofs2=None):
+        """forget computed ways. (topology has changed)
+            ways of a pair are computed again by getHops(...).ways
+        """
+        log.debug("checkHops: %s pairs invalidated" % len(self.hops))
+        for hops in self.hops.itervalues():
+            hops.invalidate()
 
-                count+=len(hops1.ways)+len(hops2.ways)
 
-        t2 = datetime.datetime.now()
-        dt = t2 - t1
-        log.debug("checkHops finished (%s-%s) for %s switchs in %s [%s entries in hops]" % (dpidSrc, dpidDst, len(switchs), str(dt), count))
+    def _handle_FlowBwUpdatedEv(self, event):
+        self.usedBwGraph.updateCookies(event.cookies)
 
 
     def _handle_LinkEvent(self, event):
+        link = event.link # link= (dpid1","port1","dpid2","port2")
+        if event.added or event.removed:
+            self.checkHops()
+
         if event.added:
-            log.debug("TODO: do something if link added?")
+            self.usedBwGraph.addLink(link)
+            self.meshMaintainer.linkAdded(link)
             return
 
-        if event.removed:
-            log.debug("TODO: do something if link dead: update routes ")
-            pass
-        else:
-            log.debug("TODO: do something if link dead: update routes ")
-            link =  event.link # link= (dpid1","port1","dpid2","port2")
-            routeToBeChanged = []
-            for route in self.routes.values():
-                if link in route.links:
-                    routeToBeChanged.append(route)
-
-            if len(routeToBeChanged) > 0:
-                for route in routeToBeChanged:
-                    path = route.path
-                    kwargs = {}
-                    kwargs['srcdpid'] = route.links.firstSwitch().dpid
-                    kwargs['srcip'] = path.src
-                    kwargs['dstip'] = path.dst
-                    kwargs['dstdpid'] = route.links.lastSwitch().dpid
-                    kwargs['outport'] = route.lastEntity.port
-                    kwargs['ipProtocol'] = ipv4.TCP_PROTOCOL
-                    kwargs['tos'] = path.tos
-                    if route.conditions:
-                        kwargs[RoutingConditions.MainKey] = route.conditions
-
-                    self._removeFlows(route)
-                    self.createRoute(path.src, path.dst, **kwargs)
-                    self._installFlows(route)
+        if not event.removed:
+            return
+
+        self.usedBwGraph.removeLink(link)
+        self.meshMaintainer.linkRemoved(link)
+
+        # mesh routes are rerouted by meshMaintainer
+        cookies = [cookie for cookie in self.getCookiesByLink(link)
+                   if not self.meshMaintainer.isMeshRoute(self.routes[cookie])]
+        if not cookies:
+            return
+
+        t1 = datetime.datetime.now()
+        graph = self.getUsedBwGraph(self.forceRoute)
+
+        # { ofs: [TableEntry, ...], ...}
+        installs = defaultdict(list)
+        removes = defaultdict(list)
+        rerouted = 0
+        failovers = 0
+        for cookie in cookies:
+            route = self.routes[cookie]
+            newRoute = None
+            if self.backupMaintainer is not None:
+                backup = self.backupMaintainer.getBackup(route, link)
+                if backup is not None:
+                    newRoute = self.rerouteRoute(route, via=backup)
+                    failovers += newRoute is not None
+            if newRoute is None:
+                newRoute = self.rerouteRoute(route, graph)
+            if newRoute is None:
+                log.error("no route to reroute cookie %s around %s" % (cookie, link))
+                continue
+
+            routeInstalls, routeRemoves = self._diffEntries(route, newRoute)
+            for ofs, tabEntry in routeInstalls.iteritems():
+                installs[ofs].append(tabEntry)
+            for ofs, tabEntry in routeRemoves.iteritems():
+                removes[ofs].append(tabEntry)
+
+            self._replaceRoute(route, newRoute)
+            rerouted += 1
+
+            # later routes see the load of this one
+            graph = self.getUsedBwGraph(self.forceRoute)
+
+        def removeStale(success):
+            core.flowBatcher.begin()
+            for ofs, tabEntries in removes.iteritems():
+                core.flowBatcher.removeStrict(ofs, tabEntries)
+            core.flowBatcher.commit()
+
+        # make before break, one write per switch
+        core.flowBatcher.begin()
+        for ofs, tabEntries in installs.iteritems():
+            core.flowBatcher.install(ofs, tabEntries)
+        core.flowBatcher.commit(removeStale)
+
+        dt = datetime.datetime.now() - t1
+        if self.backupMaintainer is not None:
+            self.backupMaintainer.failovers += failovers
+        log.info("link %s removed: %d/%d routes rerouted (%d on backup vias) in %s"
+                 % (link, rerouted, len(cookies), failovers, str(dt)))
+
+
+    def rerouteRoute(self, route, graph=None, via=None):
+        """create a copy of route going through a new via between
+            the same switchs. entries keep the match of the route.
+            via -- via to use (ex: backup), searched if None with the
+                   conditions of the route. without feasible via for its
+                   bandwidth, the route gets a via without reservation.
+            return None if there is no via.
+        """
+        if not route.links or not route.entries:
+            return None
+
+        if via is None:
+            srcdpid = route.links.firstSwitch().dpid
+            dstdpid = route.links.lastSwitch().dpid
+            minBw = None
+            logic = None
+            if route.conditions is not None:
+                minBw = route.conditions.get(RoutingConditions.bandwidth)
+                logic = route.conditions.get(RoutingConditions.logic)
+            via = self.getVia(srcdpid, dstdpid, minBw, graph, logic)
+            if not via and minBw:
+                log.warn("no feasible via for cookie %s (%s), rerouted without reservation"
+                         % (route.cookie, minBw))
+                via = self.getVia(srcdpid, dstdpid, None, graph, logic)
+        if not via:
+            return None
+
+        template = route.entries.itervalues().next()
+
+        newRoute = ScnRoute()
+        newRoute.cookie = route.cookie
+        newRoute.path = route.path
+        newRoute.conditions = route.conditions
+        newRoute.links = ScnLinks(via)
+        newRoute.firstEntity = route.firstEntity
+        newRoute.lastEntity = route.lastEntity
+
+        for link in via:
+            newRoute.entries[link.ofs1] = TableEntry(
+                    priority = template.priority,
+                    cookie = template.cookie,
+                    idle_timeout = template.idle_timeout,
+                    hard_timeout = template.hard_timeout,
+                    match = template.match,
+                    actions = [of.ofp_action_output(port=link.ofp1.number, max_len=0)])
+
+        return newRoute
+
+
+    def _replaceRoute(self, old, new):
+        """replace old by new in the route table (flows are not sent).
+        """
+        self._unindexRoute(old)
+        self.routes[new.cookie] = new
+        self._indexRoute(new)
+        self.usedBwGraph.updateRoute(old)
+        self.usedBwGraph.updateRoute(new)
+        if not self.meshMaintainer.isMeshRoute(new):
+            # link failure reroute, mesh refreshes are not moves
+            self.damper.recordMove(new.cookie, forced=True)
+
+        ev = RouteChangedEv(old, new)
+        self.raiseEvent(ev)
 
 
     def getRoutes2(self, via=None):
@@ -478,7 +632,11 @@ class Routing(EventMixin):
 
         if isinstance(via, ScnLinks):
             routes = []
-            for c, r in self.routes.iteritems():
+            if not via:
+                return routes
+
+            for cookie in self.routeIndex.bySwitch.get(via[0].dpid1, ()):
+                r = self.routes[cookie]
                 if r.links == via:
                     routes.append(r)
 
@@ -490,31 +648,83 @@ class Routing(EventMixin):
             return self.routes.get(key, None)
 
         if isinstance(key, Path):
-            for c, r in self.routes.iteritems():
-                if r.path == key:
-                    return r
+            for cookie in self.routeIndex.byPath.get(key, ()):
+                return self.routes[cookie]
+
+
+    def getCookiesByLink(self, link):
+        """get cookies of routes going through link.
+        """
+        return list(self.routeIndex.byLink.get(link, ()))
+
+
+    def getRoutesByIp(self, addr):
+        """get routes whose path starts or ends at addr.
+        """
+        return [self.routes[c] for c in self.routeIndex.byIp.get(addr, ())]
+
+
+    def getRoutesByTos(self, tos):
+        return [self.routes[c] for c in self.routeIndex.byTos.get(tos, ())]
+
+
+    def getRoutesBySwitch(self, dpid):
+        """get routes which have a flow entry or a link on the switch.
+        """
+        return [self.routes[c] for c in self.routeIndex.bySwitch.get(dpid, ())]
 
 
     def delPath(self, path):
-        for r in self.routes.values():
-            if r.path == path:
-                self.delRoute(r)
+        for cookie in list(self.routeIndex.byPath.get(path, ())):
+            self.delRoute(self.routes[cookie])
 
         log.warn('Path %s has been deleted\n' % path)
         return
 
 
+    def _indexRoute(self, route):
+        self.routeIndex.add(route)
+        self._routeChanged(route)
+
+
+    def _unindexRoute(self, route):
+        self.routeIndex.remove(route)
+        self._routeChanged(route)
+
+
+    def _routeChanged(self, route):
+        if core.hasComponent('routeSnapshot'):
+            core.routeSnapshot.routeChanged(route.cookie)
+
+
+    def restoreRoute(self, route):
+        """add a route restored by scn.routeSnapshot.
+            its cookie is already claimed and its flow entries are
+            already on the switchs.
+        """
+        self.routes[route.cookie] = route
+        self._indexRoute(route)
+        self.usedBwGraph.updateRoute(route)
+
+
     def routeExists(self, route):
         r = self.routes.get(route.cookie, None)
         return r
 
 
-    def addRoute(self, route):
+    def addRoute(self, route, install=True):
+        """add or update a route.
+            install -- send flow entries of a new route.
+                       (False: the caller sends them)
+        """
         oldRoute = self.routeExists(route)
         if oldRoute:
             route.cookie = oldRoute.cookie
         else:
             route.cookie = self.reserveCookie()
+            if route.cookie is None:
+                log.error('Unable to add route %s: no cookie available' % route.path)
+                return
 
         for ofs, tabEntry in route.entries.iteritems():
             tabEntry.cookie = route.cookie
@@ -527,156 +737,138 @@ class Routing(EventMixin):
                 self.optimizeRequested = True
 
             self.updateRoute(oldRoute, route)
+            self._unindexRoute(oldRoute)
             self.routes[route.cookie] = route
+            self._indexRoute(route)
+            self.usedBwGraph.updateRoute(oldRoute)
+            self.usedBwGraph.updateRoute(route)
+            if list(oldRoute.links or ()) != list(route.links or ()) \
+                    and not self.meshMaintainer.isMeshRoute(route):
+                self.damper.recordMove(route.cookie)
             return
 
         log.info('\nADD ROUTE with cookie %d\n' % route.cookie)
-        for link in route.links:
-            link.cookies.append(route.cookie)
-
         self.routes[route.cookie] = route
-        self._installFlows(route)
+        self._indexRoute(route)
+        self.usedBwGraph.updateRoute(route)
+        if install:
+            self._installFlows(route)
 
 
-    def _installFlows(self, route):
+    def _installFlows(self, route, callback=None):
+        """send flow entries of route in one flowBatcher transaction.
+            callback -- callable(success) called when switchs confirmed them.
+        """
+        core.flowBatcher.begin()
         for ofs, tabEntry in route.entries.iteritems():
-            ofs.flow_table.install(tabEntry)
+            core.flowBatcher.install(ofs, tabEntry)
+        core.flowBatcher.commit(callback)
 
 
     def updateRoute(self, old, new):
-        identical = True
-
-        # rules that we have to delete are inside oldRoute
-        # and not in newRoute
-        for ofs, oldTabEntry in old.entries.iteritems():
-            newTabEntry = new.entries.get(ofs, None)
-            if not newTabEntry:
-                log.debug("%s :[not newTabEntry] delete TabEntry {%s}" % (ofs, oldTabEntry.__class__))
-                ofs.flow_table.remove_strict(oldTabEntry)
-                identical = False
-                continue
-
-            newFlowMod = newTabEntry.to_flow_mod()
-
-            if oldTabEntry.is_matched_by(newFlowMod.match):
-                if oldTabEntry.actions != newTabEntry.actions:
-                    identical = False
-                    log.debug("%s :[actions differs] delete TabEntry {%s}" % (ofs, oldTabEntry.__class__))
-                    ofs.flow_table.remove_strict(oldTabEntry)
-                continue
-
-            identical = False
-            log.debug("%s :[matchs differs] delete TabEntry {%s}" % (ofs, oldTabEntry.__class__))
-            ofs.flow_table.remove_strict(oldTabEntry)
-
-        if identical:
+        """make before break update of the flow entries of a route.
+            1. install the new entries downstream of the ingress switch
+            2. once confirmed, switch the entry of the ingress switch
+            3. once confirmed, remove the stale entries
+            switchs whose entry does not change get no flow-mod.
+        """
+        installs, removes = self._diffEntries(old, new)
+        if not installs and not removes:
             log.debug("route with same rules already exists. Nothing to do here")
             return
 
-        # add or update flow rule
-        self._installFlows(new)
-
-        #update Cookie in route.links
-        for link in old.links:
-            try:
-                link.cookies.remove(old.cookie)
-            except KeyError:
-                log.warn("Try to remove a nonexisting key")
-                pass
-            except ValueError:
-                log.warn("Try to remove a nonexisting key")
-                pass
-
-        for link in new.links:
-            if new.cookie not in link.cookies:
-                    link.cookies.append(new.cookie)
-
-        log.debug("TODO: send event ?")
-        log.debug("FlowTableModification should have been launched")
+        ingress = new.links.firstSwitch() if new.links else None
+        ingressEntry = installs.pop(ingress, None)
+
+        def removeStale(success):
+            if not success:
+                log.warn("ingress of route %s may not be switched" % new.cookie)
+            core.flowBatcher.begin()
+            for ofs, tabEntry in removes.iteritems():
+                log.debug("%s : delete stale TabEntry of route %s" % (ofs, new.cookie))
+                core.flowBatcher.removeStrict(ofs, tabEntry)
+            core.flowBatcher.commit()
+
+        def switchIngress(success):
+            if not success:
+                log.warn("downstream entries of route %s may not be installed" % new.cookie)
+            core.flowBatcher.begin()
+            if ingressEntry is not None:
+                core.flowBatcher.install(ingress, ingressEntry)
+            core.flowBatcher.commit(removeStale)
+
+        core.flowBatcher.begin()
+        for ofs, tabEntry in installs.iteritems():
+            core.flowBatcher.install(ofs, tabEntry)
+        core.flowBatcher.commit(switchIngress)
 
         # send RouteChangedEv
         ev = RouteChangedEv(old, new)
         core.routing.raiseEvent(ev)
 
 
-    def delRoute(self, Route):
-        for link in Route.links:
-            link.cookies.remove(Route.cookie)
-        self._removeFlows(Route)
+    def _diffEntries(self, old, new):
+        """per switch difference between entries of two routes.
+            return (installs, removes)
+              installs -- { ofs: TableEntry, ...} new or changed entries
+              removes  -- { ofs: TableEntry, ...} old entries not overwritten
+                          by an entry of installs (match differs)
+        """
+        installs = {}
+        removes = {}
+        for ofs, newTabEntry in new.entries.iteritems():
+            oldTabEntry = old.entries.get(ofs)
+            if oldTabEntry is not None \
+                    and oldTabEntry.is_matched_by(newTabEntry.match, newTabEntry.priority, strict=True) \
+                    and oldTabEntry.actions == newTabEntry.actions:
+                continue # untouched switch
+            installs[ofs] = newTabEntry
+
+        for ofs, oldTabEntry in old.entries.iteritems():
+            newTabEntry = new.entries.get(ofs)
+            if newTabEntry is not None \
+                    and oldTabEntry.is_matched_by(newTabEntry.match, newTabEntry.priority, strict=True):
+                continue # overwritten by the new entry
+            removes[ofs] = oldTabEntry
+
+        return installs, removes
+
+
+    def delRoute(self, Route, remove=True):
+        """delete a route.
+            remove -- remove flow entries of the route.
+                      (False: the caller removes them)
+        """
+        if remove:
+            self._removeFlows(Route)
+        self._unindexRoute(Route)
         del self.routes[Route.cookie]
+        self.releaseCookie(Route.cookie)
+        self.damper.forget(Route.cookie)
+        self.usedBwGraph.updateRoute(Route)
         log.debug("TODO: raiseEvent RouteDeletedEv")
         log.warn('Route with cookie %d has been deleted\n' % Route.cookie)
 
 
-    def _removeFlows(self, route):
+    def _removeFlows(self, route, callback=None):
+        core.flowBatcher.begin()
         for ofs, tabEntry in route.entries.iteritems():
-            ofs.flow_table.remove_strict(tabEntry)
+            core.flowBatcher.removeStrict(ofs, tabEntry)
+        core.flowBatcher.commit(callback)
 
 
     def getRoutesDijkstra(self, src, dst, graph):
-        D = {} # Final distances dict
-        P = {} # Predecessor dict
-
-        # Fill the dicts with default values
-        for node in graph.keys():
-            D[node] = 10**15 # Vertices are unreachable
-            P[node] = "" # Vertices have no predecessors
-
-        D[src] = 0 # The start vertex needs no move
-
-        unseen_nodes = graph.keys() # All nodes are unseen
-
-        foundDst = False
-        foundSrc = False
-
-        if src in graph.keys():
-            foundSrc = True
-
-        while len(unseen_nodes) > 0:
-            # Select the node with the lowest value in D (final distance)
-            shortest = None
-            node = ''
-            for temp_node in unseen_nodes:
-                if shortest == None:
-                    shortest = D[temp_node]
-                    node = temp_node
-                elif D[temp_node] < shortest:
-                    shortest = D[temp_node]
-                    node = temp_node
-
-            # Remove the selected node from unseen_nodes
-            unseen_nodes.remove(node)
-
-            # For each child (ie: connected vertex) of the current node
-            for child_node, child_value in graph[node].items():
-                if child_node == dst:
-                    foundDst = True
-                if D[child_node] > D[node] + child_value:
-                    D[child_node] = D[node] + child_value
-                    # To go to child_node, you have to go through node
-                    P[child_node] = node
-
-        # Set a clean path
-        path = []
-
-        #if src and dst are not in the graph we return an empty path
-        if not foundSrc and not foundDst:
-            return path
-
-        # We begin from the end
-        node = dst
-        # While we are not arrived at the beginning
-        while not (node == src):
-            if path.count(node) == 0:
-                path.insert(0, (P[node],node, graph[P[node]][node])) # Insert the predecessor of the current node
-                node = P[node] # The current node becomes its predecessor
-            else:
-                break
-
-        return path
+        return shortestPath(graph, src, dst)
 
 
-    def getRoutes(self, src, dst):
+    def getRoutes(self, src, dst, k=None):
+        """get k shortest loopless vias between two switchs.
+            src, dst -- dpid or ScnOpenFlowSwitch.
+            k        -- number of vias (None -> self.kPaths).
+            return [ScnLinks, ...] sorted by cost.
+              cost of a link is its "non free" bandwidth plus one, so
+              vias with same load are sorted by hop count.
+        """
         if isinstance(src, (int, long)):
             dpid = src
             src = core.topology.getOFS(dpid)
@@ -691,45 +883,10 @@ class Routing(EventMixin):
                 log.error("Unknown switch with dpid %s" % str(dpid))
                 return
 
-        n = len(core.topology.getSwitchs())
-        allLinks = ScnLinks(core.openflow_discovery.getAllLinks())
-
-        return self._getRoutes(src, dst, allLinks, n)
-
-
-    def _getRoutes(self, src, dst, allLinks, n):
+        if k is None:
+            k = self.kPaths
 
-        def f(src, dst, route=ScnLinks(), res=[]):
-            if route.hops() > 1:
-                if route.lastSwitch() == dst:
-                    return res
-                if route.hops() == (n*2):
-                    return res
-
-            links = [link for link in allLinks if link.ofs1 == src]
-            links = ScnLinks(links)
-            for link in links:
-                _route = route.clone()
-                _route.append(link)
-                if _route.hops() >= n*2:
-                    return res
-
-                if _route.lastSwitch() == dst:
-                    res.append(_route)
-                    continue
-
-                #if we have allready pass by this switch forget this route
-                if route.containSwitch(link.ofs2):
-                    continue
-
-                if len(_route) > 3:
-                    continue
-                f(_route.lastSwitch(), dst, route=_route, res=res)
-
-            return res
-
-        routes = sorted(f(src, dst), key=len)
-        return routes
+        return [ScnLinks(via) for via in self.viaSearch.getKVias(src.dpid, dst.dpid, k)]
 
 
     def _invert(self, src, dst, key1, key2):
@@ -765,41 +922,72 @@ class Routing(EventMixin):
 
         via = kwargs.get(VIA)
         if via:
-            if len(via) > 0:
-                reverseVia = []
-                for link in via:
-                    _srcOfp = link.ofp2
-                    _dstOfp = link.ofp1
-
-                    reverseLink = core.openflow_discovery.getLink(_srcOfp, _dstOfp)
-                    if reverseLink is not None:
-                        reverseVia.append(reverseLink)
-                    else:
-                        log.error("link not found ")
-                        del kwargs[VIA]
-                        continue
-
-                res[VIA] = reverseVia.reverse()
+            reverseVia = self._reverseVia(via)
+            if reverseVia is None:
+                log.error("reverse link not found, reverse via is searched")
+                del res[VIA]
             else:
-                del kwargs[VIA]
+                res[VIA] = reverseVia
+        elif VIA in res:
+            del res[VIA]
 
         return res
 
 
+    def _reverseVia(self, via):
+        """reverse links of via, from its last switch to its first one.
+            return None if a reverse link is missing.
+        """
+        reverseVia = []
+        for link in reversed(list(via)):
+            if link.dpid1 == link.dpid2:
+                reverseLink = ScnLink(link.ofp2, link.ofp1) # local via
+            else:
+                reverseLink = core.openflow_discovery.getLink(link.ofp2, link.ofp1)
+            if reverseLink is None:
+                return None
+            reverseVia.append(reverseLink)
+        return reverseVia
+
+
     def createBiRoute(self, src, dst, *args, **kwargs):
-        routeA = self.createRoute(src, dst, *args, **kwargs)
+        """create the routes src -> dst and dst -> src.
+            symmetric -- the reverse route goes through the reverse links
+                         of the forward one, without search.
+                         (default self.symmetric, False: searched)
+            both ends are resolved once.
+        """
+        symmetric = kwargs.pop(SYMMETRIC, self.symmetric)
+        protocol = kwargs.get(PROTOCOL) or ethernet.IP_TYPE
+
+        srcinfo = self._resolveOnce(src, kwargs.get(SRCMAC), kwargs.get(SRCIP),
+                                    kwargs.get(SRCDPID), kwargs.get(INPORT), protocol, "src")
+        dstinfo = self._resolveOnce(dst, kwargs.get(DSTMAC), kwargs.get(DSTIP),
+                                    kwargs.get(DSTDPID), kwargs.get(OUTPORT), protocol, "dst")
+
+        routeA = None
+        if srcinfo is not None and dstinfo is not None:
+            routeA = self._createRoute(srcinfo, dstinfo, protocol, **kwargs)
         if not routeA:
             log.error('Unable to create Route\nsrc:{0}\ndst{1}\nargs:{2}'\
                     .format(src, dst, kwargs))
             return None, None
 
-        invertedKwargs = self._invertRouteDict(**kwargs)
+        invertedKwargs = self._invertRouteDict(**kwargs) or {}
         conditions = invertedKwargs.get(RoutingConditions.MainKey)
         if conditions:
             del invertedKwargs[RoutingConditions.MainKey]
 
-        pathB = Path.create(dst, src, **invertedKwargs)
-        routeB = self.createRoute(dst, src, *args, **invertedKwargs)
+        if symmetric and VIA not in invertedKwargs and routeA.links:
+            reverseVia = self._reverseVia(routeA.links)
+            if reverseVia is not None:
+                invertedKwargs[VIA] = reverseVia
+
+        if kwargs.get(GATEWAY):
+            # the reverse route starts from the gateway, not from dst
+            routeB = self.createRoute(dst, src, *args, **invertedKwargs)
+        else:
+            routeB = self._createRoute(dstinfo, srcinfo, protocol, **invertedKwargs)
         if not routeB:
             log.error('Unable to create Route\nsrc:{1}\ndst{0}\nargs:{2}\ninvertargs:{3}'\
                     .format(src, dst, kwargs, invertedKwargs))
@@ -810,29 +998,65 @@ class Routing(EventMixin):
             routeA.cookie = cookie
             routeB.cookie = self.route_pair[cookie]
 
-        self.addRoute(routeA)
-        self.addRoute(routeB)
+        # both directions are sent in one write per switch
+        core.flowBatcher.begin()
+        try:
+            self.addRoute(routeA)
+            self.addRoute(routeB)
+        finally:
+            core.flowBatcher.commit()
         self.route_pair[routeA.cookie] = routeB.cookie
 
         return routeA, routeB
 
 
+    def createBiRoutes(self, requests):
+        """create several bidirectional routes.
+            requests -- [(src, dst, kwargs), ...] (see createBiRoute)
+            routes are searched in order and each one is charged on
+            usedBwGraph before the next search, so reservations of the
+            batch do not over-commit a link. flow-mods of all routes are
+            sent in one write per switch. ends shared by several requests
+            are resolved once.
+            return [(routeA, routeB, reason), ...]
+              reason is None, or NO_FEASIBLE_PATH or NOT_CREATED with
+              (None, None) routes.
+        """
+        results = []
+        self._resolved = {}
+        core.flowBatcher.begin()
+        try:
+            for src, dst, kwargs in requests:
+                self.noFeasiblePath = False
+                try:
+                    routeA, routeB = self.createBiRoute(src, dst, **kwargs)
+                except Exception as inst:
+                    log.exception(inst)
+                    routeA, routeB = None, None
+
+                reason = None
+                if not routeA or not routeB:
+                    reason = NO_FEASIBLE_PATH if self.noFeasiblePath else NOT_CREATED
+                results.append((routeA, routeB, reason))
+        finally:
+            self._resolved = None
+            core.flowBatcher.commit()
+
+        return results
+
+
     def createMesh(self, dst):
-        host = core.topology.getHost(dst)
-        dpid = host.ofp.ofs.dpid
+        """create mesh routes toward dst from all switchs.
+            once created, they are kept up to date by self.meshMaintainer.
+        """
+        if dst in self.mesh:
+            return
 
         graph = self.getUsedBwGraph(self.forceRoute)
         log.debug("[ABL] -->  graph: %s" % graph)
 
-        mesh = self.mesh.get(dst)
-        if mesh is None:
-            self.mesh[dst] = {}
-            self._createMesh(dst, graph)
-
-        for ip, mesh in self.mesh.iteritems():
-            # check the flow to the adjacent switch
-            if dpid not in mesh.keys():
-                self._createMesh(ip, graph)
+        self.mesh[dst] = {}
+        self._createMesh(dst, graph)
 
 
     def _createMesh(self, dst, graph, *args, **kwargs):
@@ -866,54 +1090,20 @@ class Routing(EventMixin):
                        of.ofp_action_output(port=outport, max_len=0)
                       ]
 
-        mesh = self.mesh[dst]
+        self.meshMaintainer.build(dst, dstdpid, dstmac, outport, msg, graph, **kwargs)
 
-        # Flow to the node from the adjacent switch
-        if dstdpid not in mesh.keys():
-            # send message to switch
-            ofs = core.topology.getOFS(dstdpid)
-            tabEntry = TableEntry.from_flow_mod(msg)
-            ofs.flow_table.install(tabEntry)
-            mesh[dstdpid] = 0
-
-        msg.match.nw_tos = 0
-
-        # Flow to the adjacent switch from other switches
-        for sw in core.topology.getSwitchs():
-            if dstdpid == sw.dpid:
-                continue
-            if sw.dpid in mesh.keys():
-                continue
-
-            via = self.getVia(sw.dpid, dstdpid, None, graph)
-            route = ScnRoute()
-            route.links = via
-            route.path = Path.create(None, dst, **kwargs)
-
-            for link in via:
-                msg.actions = [of.ofp_action_output(port=link.ofp1.number, max_len=0)]
-
-                # send message to switch
-                ofs = link.ofs1
-                tabEntry = TableEntry.from_flow_mod(msg)
-                route.entries[ofs] = tabEntry
-
-            # rewrite dst mac if last switch != first switch
-            msg.actions = [
-                           of.ofp_action_dl_addr.set_dst(dstmac),
-                           of.ofp_action_output(port=outport, max_len=0)
-                          ]
-
-            # send message to switch
-            ofs = core.topology.getOFS(dstdpid)
-            tabEntry = TableEntry.from_flow_mod(msg)
-
-            # use for jsonLogger
-            route.lastEntity = tabEntry.actions[1]
-            log.debug('a route should have been created')
 
-            self.addRoute(route)
-            mesh[sw.dpid] = route.cookie
+    def _resolveOnce(self, *args):
+        """_resolveInfo, once per createBiRoutes batch.
+        """
+        if self._resolved is None:
+            return self._resolveInfo(*args)
+        try:
+            if args not in self._resolved:
+                self._resolved[args] = self._resolveInfo(*args)
+            return self._resolved[args]
+        except TypeError: # unhashable end
+            return self._resolveInfo(*args)
 
 
     def _resolveInfo(self, addr, mac, ip, dpid, port, protocol, kind=""):
@@ -1171,6 +1361,12 @@ class Routing(EventMixin):
         if srcinfo is None or dstinfo is None:
             return None
 
+        return self._createRoute(srcinfo, dstinfo, protocol, **kwargs)
+
+
+    def _createRoute(self, srcinfo, dstinfo, protocol, **kwargs):
+        """createRoute between resolved ends: (addr, mac, ip, dpid, port).
+        """
         src, srcmac, srcip, srcdpid, inport = srcinfo
         dst, dstmac, dstip, dstdpid, outport = dstinfo
 
@@ -1186,18 +1382,28 @@ class Routing(EventMixin):
         if srcdpid == dstdpid:
             via = self.getLocalVia(srcdpid, srcip, dstdpid, dstip)
 
+        path = Path.create(src, dst, **kwargs)
+
         if via is None or self.forceRoute:
             minBw = None
+            logic = None
             if conditions is not None:
                 minBw = conditions.get(RoutingConditions.bandwidth)
-            via = self.getVia(srcdpid, dstdpid, minBw)
+                logic = conditions.get(RoutingConditions.logic)
+            if self.viaSearch.ecmp and not minBw and logic in (None, LOGIC_SHORTEST):
+                via = self.getEcmpVia(srcdpid, dstdpid, path)
+            else:
+                via = self.getVia(srcdpid, dstdpid, minBw, logic=logic)
+            if via is None:
+                return None
+            via = self.viaSearch.dampVia(path, srcdpid, dstdpid, via, minBw, logic)
 
         log.debug("via (scnLinks) => \n%s" % str(via))
 
         route = ScnRoute()
         route.links = ScnLinks(via)
         route.conditions = conditions
-        route.path = Path.create(src, dst, **kwargs)
+        route.path = path
 
         # DO NOT REWRITE MAC ADDRESSES BETWEEN THE SWITCHES
         # ONLY THE LAST SWITCH WILL CHANGE THE DESTINATION MAC
@@ -1258,81 +1464,32 @@ class Routing(EventMixin):
 
 
     def getUsedBwGraph(self, forceRoute=False):
-        ######################################################################################
-        ## Dijkstra way to find the possible via
-        ######################################################################################
-        graph ={}
-        for link in core.openflow_discovery.getAllLinks():
-            dstLst = {}
-            try:
-                dstLst = graph[link.ofs1.dpid]
-            except KeyError:
-                pass
-
-            linkBwReserved = 0
-            maximumBwNonFree = 0
-            usedBw = 0
-            reverseLink = core.openflow_discovery.getLink(link.ofp2, link.ofp1)
-            for cookie in link.cookies:
-                _route = self.getRoute(cookie)
-                if _route is not None:
-                      if _route.conditions is not None and _route.conditions[RoutingConditions.bandwidth] is not None:
-                        linkBwReserved = _route.conditions[RoutingConditions.bandwidth]
-                try:
-                    if core.flowBw.flowBws[cookie] is not None:
-                        if core.flowBw.flowBws[cookie].segBws[reverseLink.ofs2.dpid]:
-                            usedBw = ceil(core.flowBw.flowBws[cookie].segBws[link.ofs2.dpid].bw)
-
-                except KeyError:
-                    usedBw = 0
-                maximumBwNonFree += max(linkBwReserved,usedBw)
-                log.debug("[ABL] %s->%s : %s ~ %s/%s => %s" % (link.ofs1.dpid, link.ofs2.dpid, cookie, linkBwReserved, usedBw, maximumBwNonFree))
-
-            if reverseLink is not None:
-                for cookie in reverseLink.cookies:
-                    _route = self.getRoute(cookie)
-                    if _route is not None:
-                        if _route.conditions is not None and _route.conditions[RoutingConditions.bandwidth] is not None:
-                            linkBwReserved = _route.conditions[RoutingConditions.bandwidth]
-                        try:
-                            if core.flowBw.flowBws[cookie] is not None:
-                                if core.flowBw.flowBws[cookie].segBws[reverseLink.ofs2.dpid]:
-                                    usedBw = ceil(core.flowBw.flowBws[cookie].segBws[link.ofs2.dpid].bw)
-                        except KeyError:
-                            usedBw = 0
-                    maximumBwNonFree += max(linkBwReserved,usedBw)
-                    log.debug("[ABL] %s->%s : %s ~ %s/%s => %s" % (link.ofs1.dpid, link.ofs2.dpid, cookie, linkBwReserved, usedBw, maximumBwNonFree))
-
-            if forceRoute:
-                    maximumBwNonFree=1
-
-            dstLst[link.ofs2.dpid] = maximumBwNonFree
-            graph[link.ofs1.dpid] = dstLst
-
-        return graph
-
-
-    def getVia(self, srcdpid, dstdpid, minBw=None, graph=None):
-        if graph is None:
-            graph = self.getUsedBwGraph(self.forceRoute)
-            log.debug("[ABL] -->  graph: %s" % graph)
+        """get read-only weighted graph {dpid: {dpid: cost}}.
+            maintained by self.usedBwGraph, it is not rebuilt per call.
+        """
+        return self.usedBwGraph.view(forceRoute)
 
-        t1 = datetime.datetime.now()
-        possibleVia = self.getRoutesDijkstra(srcdpid, dstdpid, graph)
-        t2 = datetime.datetime.now()
-        dt = t2 - t1
-        log.debug("[ABL] --> possibleVia Dijkstra [%s] found in %s in [%s]" % (possibleVia, str(dt), graph))
-
-        via = []
-        for vertex in possibleVia:
-            link = core.openflow_discovery.getLinkByDpid(vertex[0],vertex[1])
-            via.append(link)
-
-            if minBw is not None and vertex[2] < minBw:
-                log.debug('link %s : not enough bandwidth' % link)
-                self.optimizeRequested = True
 
-        return via
+    def getVia(self, srcdpid, dstdpid, minBw=None, graph=None, logic=None):
+        """search via between two switchs (scn.viaSearch.ViaSearch.getVia).
+        """
+        return self.viaSearch.getVia(srcdpid, dstdpid, minBw, graph, logic)
+
+
+    def getWidestVia(self, srcdpid, dstdpid, minBw=None):
+        return self.viaSearch.getWidestVia(srcdpid, dstdpid, minBw)
+
+
+    def getLatencyVia(self, srcdpid, dstdpid, minBw=None):
+        return self.viaSearch.getLatencyVia(srcdpid, dstdpid, minBw)
+
+
+    def getEcmpVias(self, srcdpid, dstdpid):
+        return self.viaSearch.getEcmpVias(srcdpid, dstdpid)
+
+
+    def getEcmpVia(self, srcdpid, dstdpid, path):
+        return self.viaSearch.getEcmpVia(srcdpid, dstdpid, path)
 
 
     def getLocalVia(self, srcdpid, srcip, dstdpid, dstip):
@@ -1366,6 +1523,38 @@ class Routing(EventMixin):
 #                         do_/help_ method for CLI                            #
 #_____________________________________________________________________________#
 
+    def help_getPathCacheStats(self):
+        msg = 'getPathCacheStats [clear]'
+        return msg
+
+
+    def do_getPathCacheStats(self, args):
+        if args.strip() == 'clear':
+            self.pathCache.clear()
+
+        stats = self.pathCache.stats()
+        retour = ""
+        for key in ('entries', 'hits', 'misses', 'invalidations', 'topologyEpoch', 'bwEpoch'):
+            retour = "%s%s: %s\n" % (retour, key, stats[key])
+        retour = "%shitRatio: %.1f%%\n" % (retour, stats['hitRatio'])
+        return retour
+
+
+    def help_getRerouteStats(self):
+        msg = 'getRerouteStats'
+        return msg
+
+
+    def do_getRerouteStats(self, args):
+        stats = self.damper.stats()
+        retour = ""
+        for key in ('moves', 'forcedMoves', 'suppressed', 'lastMinute', 'backedOff'):
+            retour = "%s%s: %s\n" % (retour, key, stats[key])
+        for cookie, moves in stats['busiest']:
+            retour = "%scookie %s: %s moves\n" % (retour, cookie, moves)
+        return retour
+
+
     def help_getAllTabEntries(self):
         msg = 'getAllEntries'
         return msg
@@ -1401,7 +1590,54 @@ def launch(**kw):
     except:
        pass
 
-    comp = Routing(forceRoute)
+    config = RoutingConfig(forceRoute=forceRoute)
+    try:
+       config.cookieWidth = int(core.parser.getValue('ROUTING', 'COOKIE_WIDTH') or COOKIE_WIDTH)
+    except:
+       pass
+
+    try:
+       config.kPaths = int(core.parser.getValue('ROUTING', 'K_PATHS') or K_PATHS)
+    except:
+       pass
+
+    try:
+       config.meshAggregate = (core.parser.getValue('ROUTING', 'MESH_AGGREGATE') or '').lower() == 'true'
+       config.meshPrefix = int(core.parser.getValue('ROUTING', 'MESH_PREFIX') or MESH_PREFIX)
+    except:
+       pass
+
+    try:
+       config.ecmp = (core.parser.getValue('ROUTING', 'ECMP') or '').upper() or None
+    except:
+       pass
+    if config.ecmp not in (None, ECMP_HASH, ECMP_LEAST_LOAD):
+       log.warn("unknown ECMP mode %s, ECMP disabled" % config.ecmp)
+       config.ecmp = None
+
+    try:
+       config.backupPaths = (core.parser.getValue('ROUTING', 'BACKUP_PATHS') or '').lower() == 'true'
+    except:
+       pass
+
+    try:
+       config.dwell = float(core.parser.getValue('ROUTING', 'DWELL_TIME') or DWELL_TIME)
+       config.hysteresis = float(core.parser.getValue('ROUTING', 'HYSTERESIS') or HYSTERESIS)
+       config.maxMoves = int(core.parser.getValue('ROUTING', 'MAX_MOVES') or MAX_MOVES)
+    except:
+       pass
+
+    try:
+       config.symmetric = (core.parser.getValue('ROUTING', 'SYMMETRIC') or '').lower() == 'true'
+    except:
+       pass
+
+    try:
+       config.allPairs = (core.parser.getValue('ROUTING', 'ALL_PAIRS') or '').lower() == 'true'
+    except:
+       pass
+
+    comp = Routing(config)
     core.register(NAME, comp)
     return comp
 
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+scn.routingConfig
+~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from scn.cookieAllocator import COOKIE_WIDTH
+from scn.meshMaintainer import MESH_PREFIX
+from scn.rerouteDamper import DWELL_TIME, HYSTERESIS, MAX_MOVES
+
+K_PATHS = 4
+
+
+class RoutingConfig:
+    """options of Routing ([ROUTING] section of the ini file).
+        forceRoute    -- search a via even if the request gives one
+        cookieWidth   -- cookie bit width (CookieAllocator)
+        kPaths        -- number of vias of getRoutes
+        meshAggregate -- mesh routes by subnet (MeshMaintainer)
+        meshPrefix    -- default prefix length of edge subnets
+        ecmp          -- None, ECMP_HASH or ECMP_LEAST_LOAD (scn.viaSearch)
+        backupPaths   -- precomputed backup vias (BackupMaintainer)
+        dwell, hysteresis, maxMoves -- damping of route moves (RerouteDamper)
+        symmetric     -- reverse routes go through the reverse links
+        allPairs      -- all pairs table for unconstrained searches
+    """
+
+    defaults = {
+        'forceRoute'   : False,
+        'cookieWidth'  : COOKIE_WIDTH,
+        'kPaths'       : K_PATHS,
+        'meshAggregate': False,
+        'meshPrefix'   : MESH_PREFIX,
+        'ecmp'         : None,
+        'backupPaths'  : False,
+        'dwell'        : DWELL_TIME,
+        'hysteresis'   : HYSTERESIS,
+        'maxMoves'     : MAX_MOVES,
+        'symmetric'    : False,
+        'allPairs'     : False,
+    }
+
+    def __init__(self, **kwargs):
+        for name in kwargs:
+            if name not in self.defaults:
+                raise TypeError("unknown routing option %s" % name)
+
+        for name, value in self.defaults.iteritems():
+            setattr(self, name, kwargs.get(name, value))
@@ -21,8 +21,8 @@ from pox.lib.util                 import dpidToStr
 from pox.core import core
 from pox.openflow.discovery import Discovery, LinkEvent, LLDPSender, LINK_TIMEOUT
 
-from collections import namedtuple
-from scn.scnOFTopology import ScnLink
+from collections import namedtuple, defaultdict
+from scn.scnOFTopology import ScnLink, DELAY_ALPHA
 
 LLDP_TTL                               = 120
 pox.openflow.discovery.LLDP_SEND_CYCLE = 1.0
@@ -31,6 +31,9 @@ DOMAIN_NAME_TLV      = 123
 OFC_NAME_TLV         = 124
 GATEWAY_IP_TLV       = 125
 GATEWAY_HW_ADDR_TLV  = 126
+TIMESTAMP_TLV        = 122 # send time, filled by ScnLLDPSender
+RTT_PROBE_PERIOD     = 5.0 # seconds between two barrier probes of a switch
+RTT_PROBE_TIMEOUT    = 10.0
 
 log = core.getLogger()
 
@@ -97,7 +100,7 @@ class ScnLLDPSender (LLDPSender):
   """
 
   SendItem = namedtuple("ScnLLDPSender",
-                      ('dpid','portNum','packet'))
+                      ('dpid','portNum','packet','timestamp'))
 
   #NOTE: This class keeps the packets to send in a flat list, which makes
   #      adding/removing them on switch join/leave or (especially) port
@@ -118,7 +121,7 @@ class ScnLLDPSender (LLDPSender):
         # Ignore local
         continue
       self._packets.append(ScnLLDPSender.SendItem(dpid, portNum,
-       self.create_discovery_packet(dpid, portNum, portAddr, self._gateway)))
+       *self.create_discovery_packet(dpid, portNum, portAddr, self._gateway)))
 
     self._setTimer()
 
@@ -127,12 +130,14 @@ class ScnLLDPSender (LLDPSender):
     if portNum > of.OFPP_MAX: return
     self.delPort(dpid, portNum)
     self._packets.append(ScnLLDPSender.SendItem(dpid, portNum,
-     self.create_discovery_packet(dpid, portNum, portAddr, self._gateway)))
+     *self.create_discovery_packet(dpid, portNum, portAddr, self._gateway)))
     self._setTimer()
 
 
   def create_discovery_packet (self, dpid, portNum, portAddr, gateway):
-    """ Create LLDP packet """
+    """ Create LLDP packet
+      return (ethernet packet, timestamp TLV filled when sent)
+    """
 
     discovery_packet = lldp()
 
@@ -153,6 +158,13 @@ class ScnLLDPSender (LLDPSender):
     sysdesc.fill(bytes('dpid:' + hex(long(dpid))[2:-1]))
     discovery_packet.add_tlv(sysdesc)
     discovery_packet = self.addInterdomainInfo(discovery_packet, gateway)
+
+    # stamped when sent, see _timerHandler
+    timestamp_tlv          = basic_tlv()
+    timestamp_tlv.tlv_type = TIMESTAMP_TLV
+    timestamp_tlv.fill(struct.pack('!d', 0.))
+    discovery_packet.add_tlv(timestamp_tlv)
+
     discovery_packet.add_tlv(end_tlv())
 
     eth = ethernet()
@@ -161,9 +173,7 @@ class ScnLLDPSender (LLDPSender):
     eth.set_payload(discovery_packet)
     eth.type = ethernet.LLDP_TYPE
 
-    po = of.ofp_packet_out(action = of.ofp_action_output(port=portNum),
-                           data = eth.pack())
-    return po.pack()
+    return eth, timestamp_tlv
 
 
   def addInterdomainInfo(self, packet, gateway):
@@ -200,12 +210,19 @@ class ScnLLDPSender (LLDPSender):
     return discovery_packet
 
 
-class ScnDiscovery(Discovery):
+  def _timerHandler (self):
+    """@override
+      fill the timestamp TLV with the send time, then pack the packet.
+    """
+    item = self._packets.pop(0)
+    self._packets.append(item)
+    item.timestamp.fill(struct.pack('!d', time.time()))
+    po = of.ofp_packet_out(action = of.ofp_action_output(port=item.portNum),
+                           data = item.packet.pack())
+    core.openflow.sendToDPID(item.dpid, po.pack())
 
-    @classmethod
-    def __equal_dpid(cls, ofp, dpid):
-        return ofp.ofs.dpid == dpid
 
+class ScnDiscovery(Discovery):
 
     def __init__ (self, install_flow = True, explicit_drop = True):
         self.explicit_drop = explicit_drop
@@ -214,12 +231,27 @@ class ScnDiscovery(Discovery):
         self._dps = set()
         self.adjacency = {} # From Link to time.time() stamp
 
+        # indexes of self.adjacency, updated when links are added or deleted
+        # { (src_ofp, dst_ofp): ScnLink, ...}
+        self._linksByOfp = {}
+        # { (dpid1, dpid2): [ScnLink, ...], ...} (parallel links)
+        self._linksByDpid = defaultdict(list)
+        # { (dpid, port): set([ScnLink, ...]), ...} (both link ends)
+        self._linksByPort = defaultdict(set)
+
         self._gateway = InterDomainGateway()
         self._gateway.load_config()
 
         self._sender = ScnLLDPSender( self._gateway)
         Timer(TIMEOUT_CHECK_PERIOD, self._expireLinks, recurring=True)
 
+        # control channel round trip of the switchs, from barriers.
+        # { dpid: smoothed rtt, ...}
+        self._rtts = {}
+        # { xid: (dpid, send time), ...}
+        self._probes = {}
+        Timer(RTT_PROBE_PERIOD, self._probeRtt, recurring=True)
+
         if core.hasComponent("openflow"):
             self.listenTo(core.openflow)
         else:
@@ -227,21 +259,140 @@ class ScnDiscovery(Discovery):
             self.listenTo(core)
 
 
+    def getRtt(self, dpid):
+        """get smoothed controller <-> switch round trip, None if unknown.
+        """
+        return self._rtts.get(dpid)
+
+
+    def _probeRtt(self):
+        """send a barrier request to each switch, its reply gives the
+            round trip of the control channel.
+        """
+        now = time.time()
+        for xid, (dpid, sent) in self._probes.items():
+            if now - sent > RTT_PROBE_TIMEOUT:
+                del self._probes[xid]
+        for dpid in self._rtts.keys():
+            if dpid not in self._dps:
+                del self._rtts[dpid]
+
+        for dpid in self._dps:
+            msg = of.ofp_barrier_request()
+            self._probes[msg.xid] = (dpid, now)
+            if not core.openflow.sendToDPID(dpid, msg):
+                del self._probes[msg.xid]
+
+
+    def _handle_BarrierIn(self, event):
+        probe = self._probes.pop(event.xid, None)
+        if probe is None:
+            return # not ours
+        dpid, sent = probe
+        if dpid != event.dpid:
+            return
+        rtt = time.time() - sent
+        if dpid in self._rtts:
+            rtt = self._rtts[dpid] + DELAY_ALPHA * (rtt - self._rtts[dpid])
+        self._rtts[dpid] = rtt
+
+
+    def updateLinkDelay(self, link, srcdpid, dstdpid, sent, now=None):
+        """add a one-way delay sample to link from an LLDP packet sent by
+            srcdpid at sent and received from dstdpid.
+            the transit time minus half the round trip of both switchs is
+            the delay of the link. no sample until both round trips are known.
+        """
+        now = now or time.time()
+        srcRtt = self._rtts.get(srcdpid)
+        dstRtt = self._rtts.get(dstdpid)
+        if srcRtt is None or dstRtt is None:
+            return None
+        return link.updateDelay(now - sent - (srcRtt + dstRtt) / 2.)
+
+
     def getAllLinks(self):
         return self.adjacency.keys()
 
 
     def getLink(self, src_ofp, dst_ofp):
-        for link in self.getAllLinks():
-            if link.src_ofp == src_ofp and link.dst_ofp == dst_ofp:
-                return link
+        return self._linksByOfp.get((src_ofp, dst_ofp))
 
 
     def getLinkByDpid(self, src_dpid, dst_dpid):
-        for link in self.getAllLinks():
-            if (self.__equal_dpid(link.src_ofp, src_dpid) and
-                self.__equal_dpid(link.dst_ofp, dst_dpid)):
-                return link
+        links = self._linksByDpid.get((src_dpid, dst_dpid))
+        if links:
+            return links[0]
+
+
+    def getLinksByDpid(self, src_dpid, dst_dpid):
+        """get all (parallel) links from src_dpid to dst_dpid.
+        """
+        return list(self._linksByDpid.get((src_dpid, dst_dpid), []))
+
+
+    def getLinksByPort(self, dpid, port):
+        """get links which start or end at (dpid, port).
+        """
+        return list(self._linksByPort.get((dpid, port), []))
+
+
+    def isSwitchOnlyPort(self, dpid, port):
+        """@override"""
+        return (dpid, port) in self._linksByPort
+
+
+    def _addLink(self, link):
+        self.adjacency[link] = time.time()
+        self._linksByOfp[(link.src_ofp, link.dst_ofp)] = link
+        self._linksByDpid[(link.dpid1, link.dpid2)].append(link)
+        self._linksByPort[(link.dpid1, link.port1)].add(link)
+        self._linksByPort[(link.dpid2, link.port2)].add(link)
+
+
+    def _removeLink(self, link):
+        del self.adjacency[link]
+        self._linksByOfp.pop((link.src_ofp, link.dst_ofp), None)
+
+        key = (link.dpid1, link.dpid2)
+        if link in self._linksByDpid.get(key, []):
+            self._linksByDpid[key].remove(link)
+            if not self._linksByDpid[key]:
+                del self._linksByDpid[key]
+
+        for key in [(link.dpid1, link.port1), (link.dpid2, link.port2)]:
+            links = self._linksByPort.get(key)
+            if links is None:
+                continue
+            links.discard(link)
+            if not links:
+                del self._linksByPort[key]
+
+
+    def _handle_PortStatus(self, event):
+        """@override
+            links of a port going down are deleted at once, routes do
+            not wait for LLDP expiry.
+        """
+        Discovery._handle_PortStatus(self, event)
+
+        desc = event.ofp.desc
+        if event.deleted or desc.state & of.OFPPS_LINK_DOWN or desc.config & of.OFPPC_PORT_DOWN:
+            links = self.getLinksByPort(event.dpid, event.port)
+            if links:
+                log.warn("port %s:%s down, %d links deleted" % (event.dpid, event.port, len(links)))
+                self._deleteLinks(links)
+
+
+    def _deleteLinks(self, links):
+        """@override
+            keep indexes in sync with self.adjacency.
+        """
+        for link in links:
+            if link not in self.adjacency:
+                continue
+            self._removeLink(link)
+            self.raiseEvent(LinkEvent, False, link)
 
 
     def _handle_PacketIn (self, event):
@@ -346,7 +497,14 @@ class ScnDiscovery(Discovery):
             return
 
         port = namedtuple("PortTuple",('dpid','port'))
-        self.setLink([port(event.dpid, event.port), port(originatorDPID, originatorPort)])
+        link = self.setLink([port(event.dpid, event.port), port(originatorDPID, originatorPort)])
+
+        # the packet went the way of the reverse link (out of the originator port)
+        sent = self.lookInTimestamp(lldph)
+        if link is not None and sent is not None:
+            reverseLink = self.getLink(link.dst_ofp, link.src_ofp)
+            if reverseLink is not None:
+                self.updateLinkDelay(reverseLink, originatorDPID, event.dpid, sent)
 
         return EventHalt # Probably nobody else needs this event
 
@@ -360,9 +518,23 @@ class ScnDiscovery(Discovery):
                 # add
                 link = ScnLink(src_ofp, dst_ofp)
                 log.info('link detected: %s' % link)
-                self.raiseEventNoErrors(LinkEvent, True, link) # TODO where is remove handler?
+                self._addLink(link)
+                self.raiseEventNoErrors(LinkEvent, True, link) # removed by _deleteLinks
+                return link
 
             self.adjacency[link] = time.time()
+            return link
+
+
+    def lookInTimestamp(self, lldph):
+        """get send time of the timestamp TLV, None if there is none.
+        """
+        for t in lldph.tlvs[3:]:
+            if t.tlv_type == TIMESTAMP_TLV and len(getattr(t, 'next', '')) == 8:
+                stamp = struct.unpack('!d', t.next)[0]
+                if stamp > 0:
+                    return stamp
+        return None
 
 
     def lookInOriginatorGateway(self, lldph):
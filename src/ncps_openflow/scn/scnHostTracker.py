@@ -12,7 +12,7 @@ from pox.lib.packet.ethernet import ethernet
 from pox.lib.packet.ipv4 import ipv4
 from pox.lib.packet.arp import arp
 from pox.lib.recoco.recoco import Timer
-from pox.lib.revent.revent import EventMixin
+from pox.lib.revent.revent import Event, EventMixin
 
 import pox.openflow.libopenflow_01 as of
 import time
@@ -139,6 +139,17 @@ class MacEntry (Alive):
         return not self.__eq__(other)
 
 
+class HostMovedEv(Event):
+    """
+    raised when a known host is seen on another switch port.
+    """
+
+    def __init__(self, host, oldOfp):
+        Event.__init__(self)
+        self.host = host
+        self.oldOfp = oldOfp
+
+
 class HostTracker (EventMixin):
     """
     Detect joined SCN Node(Host).
@@ -147,6 +158,7 @@ class HostTracker (EventMixin):
     """
     _eventMixin_events = [
         HostJoin,
+        HostMovedEv,
     ]
 
     def __init__ (self):
@@ -275,6 +287,9 @@ class HostTracker (EventMixin):
             log.debug("%i %i ignoring packetIn at switch-only port", dpid, inport)
             return
 
+        oldEntry = self.getMacEntry(packet.src)
+        moved = oldEntry is not None and (oldEntry.dpid, oldEntry.inport) != (dpid, inport)
+
         (macEntry, isLearn) = self.registerMacEntry(dpid, inport, packet)
         (pckt_srcip, hasARP) = HostTracker.getSrcIPandARP(packet.next)
         if pckt_srcip != None:
@@ -282,6 +297,8 @@ class HostTracker (EventMixin):
 
         if isLearn:
             self.createJoinedHost(dpid, inport, packet.src, pckt_srcip)
+        elif moved:
+            self.moveHost(dpid, inport, packet.src)
 
 
     def registerMacEntry(self, dpid, inport, packet):
@@ -340,6 +357,25 @@ class HostTracker (EventMixin):
         hst.raiseEvent(HostJoin, hst)
 
 
+    def moveHost(self, dpid, inport, mac):
+        """
+        move host instance to its new port.
+        and raise HostMovedEv Event.
+        """
+        hst = core.topology.getHost(mac)
+        ofp = core.topology.getOFP(dpid, inport)
+        if hst is None or ofp is None:
+            return
+
+        oldOfp = hst.ofp
+        if oldOfp is ofp:
+            return
+        oldOfp.entities.discard(hst)
+        ofp.addEntity(hst)
+        hst.ofp = ofp
+        self.raiseEvent(HostMovedEv(hst, oldOfp))
+
+
     def __check_timeouts__(self):
         for macEntry in self.entryByMAC.values():
             entryPinged = False
@@ -31,6 +31,8 @@ from scn.parser import SPEED
 
 log = core.getLogger()
 
+DELAY_ALPHA = 0.125 # weight of a new sample in smoothed delays
+
 ################################################################################
 #                              Classes definitions                             #
 ################################################################################
@@ -75,6 +77,9 @@ class ScnLink(EventMixin):
         self.time = time.time()
         self.used_bw = 0
 
+        #one-way delay in seconds (smoothed), None until measured.
+        self.delay = None
+
         #unit used for the treatment of stats
         self.stat_unit = "bit"
 
@@ -82,8 +87,6 @@ class ScnLink(EventMixin):
         self.reserved = []
         self._id = id(self) # is it enough? we will need some id logic.
 
-        self.cookies = [] #backward compatible for bwFlowBalancing class.
-
         if core.stats:
             core.stats.addListenerByName("PortStatsEv", self._handle_PortStatsEv)
             self.listenTo(core.stats)
@@ -195,6 +198,22 @@ class ScnLink(EventMixin):
             usedBandwidth = usedBandwidth * 8
         return (theoreticalMaximumBandwidth - usedBandwidth)
 
+    def getDelay(self):
+        """get smoothed one-way delay (seconds), None if not measured.
+        """
+        return self.delay
+
+    def updateDelay(self, sample, alpha=DELAY_ALPHA):
+        """smooth a one-way delay sample into self.delay (EWMA).
+            sample -- delay in seconds, negative values count as 0.
+        """
+        sample = max(sample, 0.)
+        if self.delay is None:
+            self.delay = sample
+        else:
+            self.delay += alpha * (sample - self.delay)
+        return self.delay
+
     def _handle_PortStatsEv(self, event):
         """PortStatsEvent handler
             update self stat data.
@@ -270,7 +289,8 @@ class ScnLink(EventMixin):
             "used_bw"   : self.getBandwidthUsed(),
             "avail"     : self.getBandwidthAvailable(),
             "theoircal" : self.getMaxBandwidthTheorical(),
-            "rx_bytes"  : self.rx_bytes
+            "rx_bytes"  : self.rx_bytes,
+            "delay"     : self.delay
         })
 
     @classmethod
@@ -515,6 +535,9 @@ class ScnOpenFlowSwitch(OpenFlowSwitch):
     """
     def __init__(self, sw, topo):
         OpenFlowSwitch.__init__(self, sw)
+        if core.hasComponent('routeSnapshot'):
+            # flows are adopted by flowBatcher on connection, do not wipe them
+            self.removeListener(self.flow_table._handle_SwitchConnectionUp)
         self.topo = topo
         self.table = SwitchFlowTable()
         log.debug("ScnOpenFlowSwitch init : %s" % str(self))
@@ -648,7 +671,7 @@ class ScnOpenFlowSwitch(OpenFlowSwitch):
         """
         tabEntry = TableEntry.from_flow_mod(msg)
         log.info("apply entry - %s" % str(tabEntry))
-        self.flow_table.install(tabEntry)
+        core.flowBatcher.install(self, tabEntry)
 
     def removeFlow(self, msg):
         """remove flow entry.
@@ -656,7 +679,7 @@ class ScnOpenFlowSwitch(OpenFlowSwitch):
         """
         tabEntry = TableEntry.from_flow_mod(msg)
         log.info("remove entry - %s" % str(tabEntry))
-        self.flow_table.remove_with_wildcards(tabEntry)
+        core.flowBatcher.removeWithWildcards(self, tabEntry)
 
 
 class ScnOpenFlowTopology(OpenFlowTopology):
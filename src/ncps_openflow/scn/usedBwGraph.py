@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+scn.usedBwGraph
+~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from collections import defaultdict
+from math import ceil
+
+from pox.core import core
+
+from scn.scnOFTopology import ScnLinkUpdatedEv
+
+log = core.getLogger()
+
+UTIL_STEP = 0.1 # utilization step which changes bwEpoch
+UNKNOWN_DELAY = 0.001 # seconds, delay of a link not measured yet
+HOP_DELAY     = 1e-6  # seconds added per hop, fewer hops win ties
+
+
+class UsedBwGraph:
+    """Weighted topology graph used for path computation.
+        graph is like below and is kept up to date by events,
+        only the edges touched by an event are recomputed.
+          {dpid1: {dpid2: cost, ...}, ...}
+
+        cost of an edge is the "non free" bandwidth of the link and its
+        reverse link: sum of max(reserved, used) of the routes on it.
+        with parallel links, the cheapest link gives the edge cost.
+
+        topologyEpoch changes when a link is added or removed, bwEpoch
+        when the utilization of a link crosses a UTIL_STEP boundary.
+    """
+
+    def __init__(self, routing, forceRoute=False):
+        self.routing = routing
+        self.forceRoute = forceRoute
+
+        # { ScnLink: non free bandwidth of the link itself, ...}
+        self._loads = {}
+        # { (dpid1, dpid2): set([ScnLink, ...]), ...}
+        self._pairs = defaultdict(set)
+        # { dpid1: { dpid2: cost, ...}, ...}
+        # rows are never modified in place (copy on write), so a view
+        # handed to a reader is not changed by later updates.
+        self._graph = {}
+        # { (dpid1, dpid2): cheapest ScnLink, ...}
+        self._best = {}
+
+        self._view = None
+        self._unitView = None
+
+        self.topologyEpoch = 0
+        self.bwEpoch = 0
+        # { ScnLink: utilization bucket, ...}
+        self._buckets = {}
+
+#_____________________________________________________________________________#
+
+    def view(self, forceRoute=False):
+        """get read-only graph {dpid: {dpid: cost}}.
+            the same object is returned until an edge cost changes.
+            forceRoute -- every edge costs 1.
+        """
+        if forceRoute or self.forceRoute:
+            if self._unitView is None:
+                self._unitView = dict((src, dict.fromkeys(row, 1))
+                                      for src, row in self._graph.iteritems())
+            return self._unitView
+
+        if self._view is None:
+            self._view = dict(self._graph)
+        return self._view
+
+
+    def getLink(self, dpid1, dpid2):
+        """get the link which gives the edge cost (cheapest parallel link).
+        """
+        link = self._best.get((dpid1, dpid2))
+        if link is None:
+            link = core.openflow_discovery.getLinkByDpid(dpid1, dpid2)
+        return link
+
+
+    def getLinkLoad(self, link):
+        """get non free bandwidth of the link itself.
+        """
+        return self._loads.get(link, 0)
+
+
+    def getResidual(self, link):
+        """get residual bandwidth of the link:
+            theoretical bandwidth - max(measured used, non free).
+        """
+        theorical = link.getMaxBandwidthTheorical()
+        return min(link.getBandwidthAvailable(), theorical - self.getLinkLoad(link))
+
+
+    def getFeasibleLink(self, dpid1, dpid2, minBw):
+        """get the cheapest link whose residual bandwidth is minBw at least.
+            return None if there is no such link.
+        """
+        return self.__cheapest__(self._pairs.get((dpid1, dpid2), ()), minBw)[0]
+
+
+    def getWidestLink(self, dpid1, dpid2):
+        """get the link with the largest residual bandwidth.
+        """
+        links = self._pairs.get((dpid1, dpid2))
+        if not links:
+            return None
+        return max(links, key=self.getResidual)
+
+
+    def getEqualCostLinks(self, dpid1, dpid2):
+        """get the parallel links which give the edge cost.
+        """
+        links = self._pairs.get((dpid1, dpid2))
+        if not links:
+            return []
+        costs = [(self.__linkCost__(link), link) for link in links]
+        cost = min(c for c, _ in costs)
+        return sorted((link for c, link in costs if c == cost),
+                      key=lambda link: (link.ofp1.number, link.ofp2.number))
+
+
+    def residualView(self):
+        """get graph {dpid: {dpid: residual bandwidth}} for widest path search.
+            parallel links give the largest residual. (built for each call)
+        """
+        graph = {}
+        for (dpid1, dpid2), links in self._pairs.iteritems():
+            residual = max(self.getResidual(link) for link in links)
+            graph.setdefault(dpid1, {})[dpid2] = residual
+        return graph
+
+
+    def latencyView(self, minBw=None):
+        """get graph {dpid: {dpid: delay}} for lowest latency search.
+            parallel links give the smallest delay.
+            minBw -- without the links whose residual bandwidth is below it.
+            (built for each call)
+        """
+        graph = {}
+        for (dpid1, dpid2), links in self._pairs.iteritems():
+            link = self.getLowestDelayLink(dpid1, dpid2, minBw)
+            if link is None:
+                continue
+            graph.setdefault(dpid1, {})[dpid2] = self.__linkDelay__(link)
+        return graph
+
+
+    def getLowestDelayLink(self, dpid1, dpid2, minBw=None):
+        """get the link with the smallest delay (ScnLink.delay).
+            return None if there is no link, or none with minBw residual.
+        """
+        links = self._pairs.get((dpid1, dpid2), ())
+        if minBw is not None:
+            links = [link for link in links if self.getResidual(link) >= minBw]
+        if not links:
+            return None
+        return min(links, key=self.__linkDelay__)
+
+
+    def constrainedView(self, minBw, forceRoute=False):
+        """get graph {dpid: {dpid: cost}} without the links whose
+            residual bandwidth is below minBw. (built for each call)
+        """
+        unit = forceRoute or self.forceRoute
+        graph = {}
+        for (dpid1, dpid2), links in self._pairs.iteritems():
+            link, cost = self.__cheapest__(links, minBw)
+            if link is None:
+                continue
+            graph.setdefault(dpid1, {})[dpid2] = 1 if unit else cost
+        return graph
+
+#_____________________________________________________________________________#
+
+    def rebuild(self):
+        """recompute whole graph from current links.
+        """
+        self._loads = {}
+        self._pairs = defaultdict(set)
+        self._graph = {}
+        self._best = {}
+        self._buckets = {}
+        self.topologyEpoch += 1
+        self.__invalidate__()
+        for link in core.openflow_discovery.getAllLinks():
+            self.addLink(link)
+
+
+    def addLink(self, link):
+        """add a discovered link.
+        """
+        self._pairs[(link.dpid1, link.dpid2)].add(link)
+        self.topologyEpoch += 1
+        link.addListener(ScnLinkUpdatedEv, self._handle_ScnLinkUpdatedEv)
+        self.updateLinks([link])
+
+
+    def removeLink(self, link):
+        """remove an expired link.
+        """
+        link.removeListener(self._handle_ScnLinkUpdatedEv)
+        self._loads.pop(link, None)
+        self._buckets.pop(link, None)
+        self.topologyEpoch += 1
+
+        key = (link.dpid1, link.dpid2)
+        self._pairs[key].discard(link)
+        if not self._pairs[key]:
+            del self._pairs[key]
+
+        self.__refreshEdge__(link.dpid1, link.dpid2)
+        self.__refreshEdge__(link.dpid2, link.dpid1)
+
+
+    def updateLinks(self, links):
+        """recompute edges of links and of their reverse links.
+            links -- iterable of ScnLink.
+        """
+        edges = set()
+        for link in links:
+            if (link.dpid1, link.dpid2) not in self._pairs:
+                continue # not discovered (or already expired) link
+            self._loads[link] = self.__computeLoad__(link)
+            self.__updateBucket__(link)
+            edges.add((link.dpid1, link.dpid2))
+            edges.add((link.dpid2, link.dpid1))
+
+        for dpid1, dpid2 in edges:
+            self.__refreshEdge__(dpid1, dpid2)
+
+
+    def updateRoute(self, route):
+        """recompute edges used by route.
+        """
+        if route is None or not route.links:
+            return
+        self.updateLinks(route.links)
+
+
+    def updateCookies(self, cookies):
+        """recompute edges used by routes of cookies.
+            call when flow bandwidth of cookies has been updated.
+        """
+        links = set()
+        for cookie in cookies:
+            route = self.routing.getRoute(cookie)
+            if route is None or not route.links:
+                continue
+            links.update(route.links)
+        self.updateLinks(links)
+
+#_____________________________________________________________________________#
+
+    def _handle_ScnLinkUpdatedEv(self, event):
+        self.updateLinks([event.link])
+
+#_____________________________________________________________________________#
+
+    def __computeLoad__(self, link):
+        """sum of max(reserved, used) of routes using link.
+        """
+        flowBws = {}
+        if core.hasComponent('flowBw'):
+            flowBws = core.flowBw.flowBws
+
+        load = 0
+        for cookie in self.routing.getCookiesByLink(link):
+            reservedBw = 0
+            route = self.routing.getRoute(cookie)
+            if route is not None:
+                reservedBw = route.getReservedBandwidth()
+
+            usedBw = 0
+            flowBw = flowBws.get(cookie)
+            if flowBw is not None:
+                segBw = flowBw.segBws.get(link.dpid2)
+                if segBw is not None:
+                    usedBw = ceil(segBw.bw)
+
+            load += max(reservedBw, usedBw)
+
+        return load
+
+
+    def __updateBucket__(self, link):
+        """change bwEpoch if the link utilization crossed a UTIL_STEP.
+        """
+        theorical = link.getMaxBandwidthTheorical()
+        if not theorical:
+            return
+        bucket = int((1. - float(self.getResidual(link)) / theorical) / UTIL_STEP)
+        if self._buckets.get(link) == bucket:
+            return
+        self._buckets[link] = bucket
+        self.bwEpoch += 1
+
+
+    def __linkCost__(self, link):
+        """non free bandwidth of the link and of its reverse link.
+        """
+        cost = self._loads.get(link, 0)
+        reverseLink = core.openflow_discovery.getLink(link.ofp2, link.ofp1)
+        if reverseLink is not None:
+            cost += self._loads.get(reverseLink, 0)
+        return cost
+
+
+    def __linkDelay__(self, link):
+        delay = link.getDelay()
+        if delay is None:
+            delay = UNKNOWN_DELAY
+        return delay + HOP_DELAY
+
+
+    def __cheapest__(self, links, minBw=None):
+        """return (link, cost) of the cheapest link, (None, None) if no link.
+            minBw -- ignore links whose residual bandwidth is below it.
+        """
+        cost = None
+        best = None
+        for link in links:
+            if minBw is not None and self.getResidual(link) < minBw:
+                continue
+            linkCost = self.__linkCost__(link)
+            if cost is None or linkCost < cost:
+                cost = linkCost
+                best = link
+        return best, cost
+
+
+    def __refreshEdge__(self, dpid1, dpid2):
+        """set edge cost from the cheapest of parallel links.
+        """
+        best, cost = self.__cheapest__(self._pairs.get((dpid1, dpid2), ()))
+
+        if best is None:
+            self._best.pop((dpid1, dpid2), None)
+        else:
+            self._best[(dpid1, dpid2)] = best
+
+        row = self._graph.get(dpid1, {})
+        if cost is None:
+            if dpid2 not in row:
+                return
+            row = dict(row)
+            del row[dpid2]
+            if row:
+                self._graph[dpid1] = row
+            else:
+                del self._graph[dpid1]
+        else:
+            if row.get(dpid2) == cost:
+                return
+            row = dict(row)
+            row[dpid2] = cost
+            self._graph[dpid1] = row
+
+        self.__invalidate__()
+
+
+    def __invalidate__(self):
+        self._view = None
+        self._unitView = None
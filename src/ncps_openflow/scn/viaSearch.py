@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+scn.viaSearch
+~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+"""
+
+from pox.core import core
+
+from scn.pathSearch import shortestPath, kShortestPaths, widestPath, bottleneck, equalCostPaths
+from scn.allPairsEngine import AllPairsEngine
+
+import datetime
+import itertools
+import zlib
+
+log = core.getLogger()
+
+# path selection logic (RoutingConditions.logic), same names as middleware Strategy.logic
+LOGIC_SHORTEST = 'DIJKSTRA' # minimize non free bandwidth
+LOGIC_WIDEST   = 'WIDEST'   # maximize bottleneck residual bandwidth
+LOGIC_LATENCY  = 'LATENCY'  # minimize sum of link delays (ScnLink.delay)
+
+ECMP_HASH       = 'HASH'       # spread paths by hash of src, dst and tos
+ECMP_LEAST_LOAD = 'LEAST_LOAD' # least loaded of the equal cost vias
+ECMP_MAX_PATHS  = 16
+
+
+class ViaSearch:
+    """Via searches of Routing on the graph of Routing.usedBwGraph.
+        a via is a list of ScnLink between two switchs.
+
+        getVia is the entry point: shortest (Dijkstra, or the all pairs
+        table with allPairs), constrained by a minimal residual bandwidth
+        (CSPF), widest or lowest latency via. results are cached by
+        Routing.pathCache. getEcmpVia spreads paths on the equal cost vias.
+        dampVia keeps the via of an existing route (Routing.damper).
+    """
+
+    def __init__(self, routing, ecmp=None, allPairs=False):
+        self.routing = routing
+        self.usedBwGraph = routing.usedBwGraph
+        self.pathCache = routing.pathCache
+        # None, ECMP_HASH or ECMP_LEAST_LOAD
+        self.ecmp = ecmp
+        # next-hop matrix for unconstrained searches (None: Dijkstra)
+        self.allPairs = AllPairsEngine(routing.usedBwGraph) if allPairs else None
+        # set by getVia when a constrained search found no via
+        self.noFeasiblePath = False
+
+#_____________________________________________________________________________#
+
+    def getVia(self, srcdpid, dstdpid, minBw=None, graph=None, logic=None):
+        """search via between two switchs.
+            minBw -- constrained search (CSPF): links whose residual bandwidth
+                     is below minBw are pruned before the search.
+                     return None if there is no feasible via.
+            logic -- LOGIC_WIDEST to maximize the bottleneck residual bandwidth,
+                     LOGIC_LATENCY to minimize the sum of link delays.
+                     (graph is ignored)
+            results are cached by self.pathCache, except when graph is given
+            and for LOGIC_LATENCY (delays change without any epoch).
+        """
+        self.noFeasiblePath = False
+        if logic == LOGIC_LATENCY:
+            return self.getLatencyVia(srcdpid, dstdpid, minBw)
+        if graph is not None and logic != LOGIC_WIDEST:
+            return self._searchVia(srcdpid, dstdpid, minBw, graph, logic)
+
+        key = self.pathCache.key(srcdpid, dstdpid, minBw, logic, self.routing.forceRoute)
+        hit, via = self.pathCache.get(key, minBw)
+        if hit:
+            self.noFeasiblePath = via is None
+            return via
+
+        via = self._searchVia(srcdpid, dstdpid, minBw, None, logic)
+        self.pathCache.put(key, minBw, via)
+        return via
+
+
+    def _searchVia(self, srcdpid, dstdpid, minBw=None, graph=None, logic=None):
+        if logic == LOGIC_WIDEST:
+            return self.getWidestVia(srcdpid, dstdpid, minBw)
+
+        forceRoute = self.routing.forceRoute
+        if minBw:
+            graph = self.usedBwGraph.constrainedView(minBw, forceRoute)
+        elif graph is None:
+            graph = self.routing.getUsedBwGraph(forceRoute)
+            log.debug("[ABL] -->  graph: %s" % graph)
+
+        t1 = datetime.datetime.now()
+        if self.allPairs is not None and not minBw:
+            possibleVia = self.allPairs.shortestPath(graph, srcdpid, dstdpid, forceRoute)
+        else:
+            possibleVia = shortestPath(graph, srcdpid, dstdpid)
+        t2 = datetime.datetime.now()
+        dt = t2 - t1
+        log.debug("[ABL] --> possibleVia Dijkstra [%s] found in %s in [%s]" % (possibleVia, str(dt), graph))
+
+        if minBw and not possibleVia:
+            log.warn("no feasible path %s -> %s for %s" % (srcdpid, dstdpid, minBw))
+            self.noFeasiblePath = True
+            return None
+
+        via = []
+        for vertex in possibleVia:
+            if minBw:
+                link = self.usedBwGraph.getFeasibleLink(vertex[0], vertex[1], minBw)
+            else:
+                link = self.usedBwGraph.getLink(vertex[0], vertex[1])
+            via.append(link)
+
+        return via
+
+
+    def getWidestVia(self, srcdpid, dstdpid, minBw=None):
+        """search via with the largest bottleneck residual bandwidth,
+            the shortest in hops among them.
+            return None if the bottleneck is below minBw.
+        """
+        graph = self.usedBwGraph.residualView()
+        possibleVia = widestPath(graph, srcdpid, dstdpid)
+        log.debug("widest via [%s] bottleneck %s" % (possibleVia, bottleneck(possibleVia)))
+
+        if minBw and (not possibleVia or bottleneck(possibleVia) < minBw):
+            log.warn("no feasible path %s -> %s for %s" % (srcdpid, dstdpid, minBw))
+            self.noFeasiblePath = True
+            return None
+
+        return [self.usedBwGraph.getWidestLink(dpid1, dpid2) for dpid1, dpid2, _ in possibleVia]
+
+
+    def getLatencyVia(self, srcdpid, dstdpid, minBw=None):
+        """search via with the smallest sum of link delays.
+            links not measured yet count UNKNOWN_DELAY (usedBwGraph).
+            return None if there is no via with minBw residual bandwidth.
+        """
+        graph = self.usedBwGraph.latencyView(minBw)
+        possibleVia = shortestPath(graph, srcdpid, dstdpid)
+        log.debug("latency via [%s]" % possibleVia)
+
+        if not possibleVia:
+            if minBw:
+                log.warn("no feasible path %s -> %s for %s" % (srcdpid, dstdpid, minBw))
+                self.noFeasiblePath = True
+            return None
+
+        return [self.usedBwGraph.getLowestDelayLink(dpid1, dpid2, minBw) for dpid1, dpid2, _ in possibleVia]
+
+
+    def getKVias(self, srcdpid, dstdpid, k):
+        """get k shortest loopless vias between two switchs, sorted by cost.
+            return [[ScnLink, ...], ...]
+        """
+        vias = []
+        for path in kShortestPaths(self._hopGraph(), srcdpid, dstdpid, k):
+            vias.append([self.usedBwGraph.getLink(dpid1, dpid2) for dpid1, dpid2, _ in path])
+        return vias
+
+#_____________________________________________________________________________#
+
+    def getEcmpVias(self, srcdpid, dstdpid):
+        """get all the equal cost vias between two switchs.
+            parallel links of same cost give different vias.
+            cost of a link is its "non free" bandwidth plus one, so only
+            the vias with the fewest hops tie at same load.
+            return [[ScnLink, ...], ...] (ECMP_MAX_PATHS at most)
+        """
+        key = self.pathCache.key(srcdpid, dstdpid, None, 'ECMP', self.routing.forceRoute)
+        hit, vias = self.pathCache.get(key)
+        if hit:
+            return vias
+
+        vias = []
+        for possibleVia in equalCostPaths(self._hopGraph(), srcdpid, dstdpid, ECMP_MAX_PATHS):
+            hops = [self.usedBwGraph.getEqualCostLinks(dpid1, dpid2)
+                    for dpid1, dpid2, _ in possibleVia]
+            for via in itertools.product(*hops):
+                vias.append(list(via))
+                if len(vias) >= ECMP_MAX_PATHS:
+                    break
+            if len(vias) >= ECMP_MAX_PATHS:
+                break
+
+        self.pathCache.put(key, None, vias)
+        return vias
+
+
+    def getEcmpVia(self, srcdpid, dstdpid, path):
+        """select one of the equal cost vias for path (self.ecmp mode).
+            ECMP_HASH       -- by hash of src, dst and tos, a path always
+                               gets the same via.
+            ECMP_LEAST_LOAD -- via with the smallest bottleneck load, then
+                               with the fewest routes.
+        """
+        vias = self.getEcmpVias(srcdpid, dstdpid)
+        if not vias:
+            return self.getVia(srcdpid, dstdpid)
+        if len(vias) == 1:
+            return list(vias[0])
+
+        if self.ecmp == ECMP_LEAST_LOAD:
+            def load(via):
+                return (max(self.usedBwGraph.getLinkLoad(link) for link in via),
+                        sum(len(self.routing.getCookiesByLink(link)) for link in via))
+            return list(min(vias, key=load))
+
+        if path is None:
+            flow = "%s|%s" % (srcdpid, dstdpid)
+        else:
+            flow = "%s|%s|%s" % (path.src, path.dst, getattr(path, 'tos', 0))
+        return list(vias[(zlib.crc32(flow) & 0xffffffff) % len(vias)])
+
+
+    def dampVia(self, path, srcdpid, dstdpid, via, minBw=None, logic=None):
+        """keep the via of the existing route of path, unless via is
+            cheaper by the hysteresis band and the route may move.
+            (Routing.damper, LOGIC_LATENCY compares delays)
+        """
+        if not self.routing.damper.isEnabled():
+            return via
+
+        old = self.routing.getRoute(path)
+        if old is None or not old.links or self.routing.meshMaintainer.isMeshRoute(old):
+            return via
+        if old.links.firstSwitch().dpid != srcdpid or old.links.lastSwitch().dpid != dstdpid:
+            return via
+        if list(old.links) == list(via):
+            return via
+
+        reserved = old.getReservedBandwidth()
+        for link in old.links:
+            if link.dpid1 != link.dpid2 and core.openflow_discovery.getLink(link.ofp1, link.ofp2) is not link:
+                return via # broken
+            if minBw and self.usedBwGraph.getResidual(link) + reserved < minBw:
+                return via # not feasible any more
+
+        if logic == LOGIC_LATENCY:
+            graph = self.usedBwGraph.latencyView()
+        else:
+            graph = self.routing.getUsedBwGraph(self.routing.forceRoute)
+        if self.routing.damper.keep(old.cookie, self._viaCost(old.links, graph), self._viaCost(via, graph)):
+            return list(old.links)
+        return via
+
+
+    def _viaCost(self, via, graph):
+        return sum(graph.get(link.dpid1, {}).get(link.dpid2, 0) for link in via)
+
+#_____________________________________________________________________________#
+
+    def _hopGraph(self):
+        """cost of a link is its "non free" bandwidth plus one, so vias
+            with same load are sorted by hop count.
+        """
+        graph = self.routing.getUsedBwGraph(self.routing.forceRoute)
+        return dict((dpid1, dict((dpid2, cost + 1) for dpid2, cost in row.iteritems()))
+                    for dpid1, row in graph.iteritems())
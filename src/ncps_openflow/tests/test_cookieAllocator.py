@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+tests.test_cookieAllocator
+~~~~~~~~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+
+run from src/ncps_openflow with POX on the path:
+python -m unittest discover -s tests
+"""
+
+import unittest
+
+try:
+    from scn.cookieAllocator import CookieAllocator, cookieToJson, JSON_SAFE_MAX
+except ImportError: # POX (pox.core) is not on the path
+    CookieAllocator = None
+
+
+@unittest.skipIf(CookieAllocator is None, "POX is not available")
+class CookieAllocatorTest(unittest.TestCase):
+
+    def test_fresh_cookies_first(self):
+        allocator = CookieAllocator(3)
+        self.assertEqual([allocator.reserve() for _ in range(3)], [1, 2, 3])
+        allocator.release(2)
+        self.assertEqual(allocator.reserve(), 4)
+
+    def test_released_cookies_reused_in_order(self):
+        allocator = CookieAllocator(2)
+        cookies = [allocator.reserve() for _ in range(3)]
+        allocator.release(cookies[1])
+        allocator.release(cookies[0])
+        self.assertEqual(allocator.reserve(), cookies[1])
+        self.assertEqual(allocator.reserve(), cookies[0])
+
+    def test_exhausted(self):
+        allocator = CookieAllocator(1)
+        self.assertEqual(allocator.reserve(), 1)
+        self.assertIsNone(allocator.reserve())
+        self.assertEqual(len(allocator), 1)
+
+    def test_claim(self):
+        allocator = CookieAllocator(3)
+        self.assertTrue(allocator.claim(2))
+        self.assertFalse(allocator.claim(2))
+        self.assertFalse(allocator.claim(8))
+        self.assertIn(2, allocator)
+        self.assertEqual([allocator.reserve() for _ in range(2)], [1, 3])
+
+    def test_claim_released(self):
+        allocator = CookieAllocator(2)
+        allocator.reserve()
+        allocator.release(1)
+        self.assertTrue(allocator.claim(1))
+        self.assertEqual(allocator.reserve(), 2)
+        self.assertEqual(allocator.reserve(), 3)
+        self.assertIsNone(allocator.reserve())
+
+    def test_release_not_reserved(self):
+        allocator = CookieAllocator(2)
+        allocator.release(1)
+        self.assertEqual(len(allocator), 0)
+
+    def test_invalid_width(self):
+        self.assertRaises(ValueError, CookieAllocator, 0)
+        self.assertRaises(ValueError, CookieAllocator, 65)
+
+    def test_cookie_to_json(self):
+        self.assertEqual(cookieToJson(None), None)
+        self.assertEqual(cookieToJson(JSON_SAFE_MAX), JSON_SAFE_MAX)
+        self.assertEqual(cookieToJson(JSON_SAFE_MAX + 1), str(JSON_SAFE_MAX + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+tests.test_pathCache
+~~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+
+run from src/ncps_openflow with POX on the path:
+python -m unittest discover -s tests
+"""
+
+import unittest
+
+try:
+    from scn.pathCache import PathCache
+except ImportError: # POX (pox.core) is not on the path
+    PathCache = None
+
+
+class Graph(object):
+    """epochs and residual bandwidth of UsedBwGraph.
+    """
+
+    def __init__(self):
+        self.topologyEpoch = 0
+        self.bwEpoch = 0
+        self.residual = {}
+
+    def getResidual(self, link):
+        return self.residual.get(link, 0)
+
+
+@unittest.skipIf(PathCache is None, "POX is not available")
+class PathCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph()
+        self.cache = PathCache(self.graph, minBwStep=10)
+
+    def test_hit_and_miss(self):
+        key = self.cache.key(1, 2)
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.cache.put(key, None, ['a', 'b'])
+        self.assertEqual(self.cache.get(key), (True, ['a', 'b']))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key(self):
+        self.assertEqual(self.cache.key(1, 2, 15), self.cache.key(1, 2, 19))
+        self.assertNotEqual(self.cache.key(1, 2, 15), self.cache.key(1, 2, 25))
+        self.assertNotEqual(self.cache.key(1, 2), self.cache.key(1, 2, forceRoute=True))
+        self.assertNotEqual(self.cache.key(1, 2), self.cache.key(1, 2, logic='WIDEST'))
+
+    def test_epoch_change(self):
+        key = self.cache.key(1, 2)
+        self.cache.put(key, None, ['a'])
+        self.graph.bwEpoch += 1
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.assertEqual(len(self.cache), 0)
+        self.cache.put(key, None, ['a'])
+        self.graph.topologyEpoch += 1
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.assertEqual(self.cache.invalidations, 2)
+
+    def test_min_bw_checks_residual(self):
+        key = self.cache.key(1, 2, 15)
+        self.graph.residual = {'a': 20, 'b': 16}
+        self.cache.put(key, 15, ['a', 'b'])
+        self.assertEqual(self.cache.get(key, 16), (True, ['a', 'b']))
+        self.assertEqual(self.cache.get(key, 18), (False, None))
+
+    def test_no_feasible_via(self):
+        key = self.cache.key(1, 2, 15)
+        self.cache.put(key, 15, None)
+        self.assertEqual(self.cache.get(key, 17), (True, None))
+        self.assertEqual(self.cache.get(key, 12), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+tests.test_pathSearch
+~~~~~~~~~~~~~~~~~~~~~
+:copyright: Copyright (c) 2015, National Institute of Information and Communications Technology.All rights reserved.
+:license: GPL3, see LICENSE for more details.
+
+run from src/ncps_openflow: python -m unittest discover -s tests
+"""
+
+import unittest
+
+from scn import pathSearch
+from scn.pathSearch import dijkstra, shortestPath
+from scn.pathSearch import kShortestPaths, PrunedGraph
+from scn.pathSearch import widestPath, bottleneck
+from scn.pathSearch import equalCostPaths
+from scn.pathSearch import allPairsNextHops, tablePath
+
+# 1 -> 2 -> 4 costs 2, 1 -> 3 -> 4 costs 2, 1 -> 4 costs 5
+GRAPH = {
+    1: {2: 1, 3: 1, 4: 5},
+    2: {4: 1},
+    3: {4: 1},
+    4: {},
+}
+
+
+class DijkstraTest(unittest.TestCase):
+
+    def test_distances(self):
+        distances, predecessors = dijkstra(GRAPH, 1)
+        self.assertEqual(distances, {1: 0, 2: 1, 3: 1, 4: 2})
+        self.assertIn(predecessors[4], (2, 3))
+
+    def test_stop_at_dst(self):
+        distances, _ = dijkstra({1: {2: 1}, 2: {3: 1}, 3: {}}, 1, 2)
+        self.assertEqual(distances[2], 1)
+
+    def test_shortest_path(self):
+        path = shortestPath({1: {2: 1, 3: 4}, 2: {3: 1}, 3: {}}, 1, 3)
+        self.assertEqual(path, [(1, 2, 1), (2, 3, 1)])
+
+    def test_unreachable(self):
+        self.assertEqual(shortestPath({1: {}, 2: {1: 1}}, 1, 2), [])
+        self.assertEqual(shortestPath(GRAPH, 5, 1), [])
+
+    def test_same_node(self):
+        self.assertEqual(shortestPath(GRAPH, 1, 1), [])
+
+
+def nodes(path):
+    return [path[0][0]] + [child for _, child, _ in path]
+
+
+class KShortestPathsTest(unittest.TestCase):
+
+    def test_sorted_by_cost(self):
+        paths = kShortestPaths(GRAPH, 1, 4, 3)
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(sorted(nodes(p) for p in paths[:2]), [[1, 2, 4], [1, 3, 4]])
+        self.assertEqual(nodes(paths[2]), [1, 4])
+
+    def test_fewer_paths_than_k(self):
+        self.assertEqual(len(kShortestPaths(GRAPH, 1, 4, 10)), 3)
+
+    def test_loopless(self):
+        graph = {1: {2: 1}, 2: {1: 1, 3: 1}, 3: {2: 1, 4: 1}, 4: {}}
+        paths = kShortestPaths(graph, 1, 4, 5)
+        self.assertEqual([nodes(p) for p in paths], [[1, 2, 3, 4]])
+
+    def test_no_path(self):
+        self.assertEqual(kShortestPaths(GRAPH, 4, 1, 3), [])
+        self.assertEqual(kShortestPaths(GRAPH, 1, 4, 0), [])
+
+    def test_pruned_graph(self):
+        pruned = PrunedGraph(GRAPH, nodes=[2], edges=[(1, 4)])
+        self.assertNotIn(2, pruned)
+        self.assertEqual(pruned[1], {3: 1})
+        self.assertEqual(shortestPath(pruned, 1, 4), [(1, 3, 1), (3, 4, 1)])
+        self.assertRaises(KeyError, pruned.__getitem__, 2)
+
+
+class WidestPathTest(unittest.TestCase):
+
+    def test_largest_bottleneck(self):
+        # 1 -> 4 direct: 10, 1 -> 2 -> 4: 50, 1 -> 3 -> 4: 30
+        graph = {1: {2: 80, 3: 30, 4: 10}, 2: {4: 50}, 3: {4: 100}, 4: {}}
+        path = widestPath(graph, 1, 4)
+        self.assertEqual(path, [(1, 2, 80), (2, 4, 50)])
+        self.assertEqual(bottleneck(path), 50)
+
+    def test_fewest_hops_among_widest(self):
+        graph = {1: {2: 50, 4: 50}, 2: {3: 50}, 3: {4: 50}, 4: {}}
+        self.assertEqual(widestPath(graph, 1, 4), [(1, 4, 50)])
+
+    def test_unreachable(self):
+        self.assertEqual(widestPath({1: {2: 5}, 2: {}}, 2, 1), [])
+        self.assertEqual(bottleneck([]), 0)
+
+
+class EqualCostPathsTest(unittest.TestCase):
+
+    def test_all_shortest(self):
+        paths = equalCostPaths(GRAPH, 1, 4)
+        self.assertEqual(sorted(nodes(p) for p in paths), [[1, 2, 4], [1, 3, 4]])
+
+    def test_limit(self):
+        self.assertEqual(len(equalCostPaths(GRAPH, 1, 4, 1)), 1)
+
+    def test_single(self):
+        graph = {1: {2: 1, 3: 2}, 2: {4: 1}, 3: {4: 1}, 4: {}}
+        self.assertEqual(equalCostPaths(graph, 1, 4), [[(1, 2, 1), (2, 4, 1)]])
+
+    def test_unreachable(self):
+        self.assertEqual(equalCostPaths(GRAPH, 4, 1), [])
+        self.assertEqual(equalCostPaths(GRAPH, 1, 1), [])
+
+
+@unittest.skipIf(pathSearch.numpy is None, "numpy is not available")
+class AllPairsTest(unittest.TestCase):
+
+    def test_same_cost_as_dijkstra(self):
+        graph = {1: {2: 1, 3: 4}, 2: {3: 1, 4: 7}, 3: {4: 1}, 4: {1: 2}}
+        table = allPairsNextHops(graph)
+        for src in graph:
+            for dst in graph:
+                path = tablePath(table, graph, src, dst)
+                self.assertEqual(sum(w for _, _, w in path),
+                                 sum(w for _, _, w in shortestPath(graph, src, dst)))
+
+    def test_path(self):
+        table = allPairsNextHops({1: {2: 1, 3: 4}, 2: {3: 1}, 3: {}})
+        graph = {1: {2: 1, 3: 4}, 2: {3: 1}, 3: {}}
+        self.assertEqual(tablePath(table, graph, 1, 3), [(1, 2, 1), (2, 3, 1)])
+
+    def test_unreachable(self):
+        graph = {1: {2: 1}, 2: {}, 3: {}}
+        table = allPairsNextHops(graph)
+        self.assertEqual(tablePath(table, graph, 2, 1), [])
+        self.assertEqual(tablePath(table, graph, 1, 5), [])
+
+    def test_removed_edge(self):
+        table = allPairsNextHops({1: {2: 1}, 2: {}})
+        self.assertIsNone(tablePath(table, {1: {}, 2: {}}, 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()